@@ -4,17 +4,41 @@ SilentTrace Main Analysis Module
 Real-time ultrasonic signal detection and analysis system
 """
 
+import os
 import sys
 import time
+import mmap
 import socket
 import struct
 import numpy as np
 import threading
 from typing import Dict, Any, List
-from collections import deque
 
 from config import config
-from utils import SignalProcessor, DetectionLogger, CLIDisplay, DataBuffer
+from signatures import SignatureLibrary
+from storage import ColumnarDetectionStore, SQLiteDetectionStore
+from utils import (SignalProcessor, NoiseFloorEstimator, PeriodicityDetector, FSKDemodulator,
+                   ToneTracker, BeaconTracker, DetectionLogger, CLIDisplay, SpectrumHistory,
+                   HistoryRollups, UpdateBroadcaster, FEATURE_DTYPE, DETECTION_DTYPE)
+
+# Wire format of audio_header_t in audio_capture.c (uint64 + 3 x uint32, padded to 24 bytes)
+AUDIO_HEADER = struct.Struct('QIII4x')
+
+# Layout of shm_ring_header_t in audio_capture.c; int16 samples follow the header
+SHM_RING_HEADER = np.dtype([
+    ('magic', '<u4'),
+    ('version', '<u4'),
+    ('sample_rate', '<u4'),
+    ('channels', '<u4'),
+    ('capacity', '<u8'),
+    ('write_pos', '<u8'),
+    ('read_pos', '<u8'),
+    ('reserved', 'V24')
+])
+SHM_RING_MAGIC = 0x42525453
+SHM_RING_VERSION = 1
+
+INT16_SCALE = np.float32(1.0 / 32768.0)
 
 class UltrasonicDetector:
     """Main ultrasonic signal detector class"""
@@ -23,15 +47,75 @@ class UltrasonicDetector:
         self.config = config
         self.processor = SignalProcessor(
             sample_rate=self.config.audio.sample_rate,
-            window_size=self.config.audio.fft_window_size
+            window_size=self.config.audio.fft_window_size,
+            overlap_ratio=self.config.audio.overlap_ratio
+        )
+        self.noise_floor = None
+        if self.config.detection.adaptive_noise_floor:
+            self.noise_floor = NoiseFloorEstimator(
+                hop_sec=self.processor.hop_size / self.config.audio.sample_rate,
+                time_constant_sec=self.config.detection.noise_floor_time_sec,
+                max_rise_db=self.config.detection.noise_floor_max_rise_db
+            )
+        self.periodicity = None
+        if self.config.detection.periodicity_detection:
+            self.periodicity = PeriodicityDetector(
+                hop_sec=self.processor.hop_size / self.config.audio.sample_rate,
+                window_sec=self.config.detection.periodicity_window_sec,
+                max_period_sec=self.config.detection.periodicity_max_period_sec
+            )
+        self.fsk = None
+        if self.config.detection.fsk_demodulation:
+            self.fsk = FSKDemodulator(
+                hop_sec=self.processor.hop_size / self.config.audio.sample_rate,
+                span_hz=self.config.detection.fsk_span_hz,
+                symbol_sec=self.config.detection.fsk_symbol_sec,
+                threshold_db=self.config.detection.threshold_db,
+                min_snr_db=self.config.detection.min_snr_db,
+                release_sec=self.config.detection.fsk_release_sec
+            )
+        self.tone_tracker = None
+        if self.config.detection.tone_tracking:
+            self.tone_tracker = ToneTracker(
+                sample_rate=self.config.audio.sample_rate,
+                window_size=self.config.audio.fft_window_size,
+                threshold_db=self.config.detection.threshold_db,
+                release_sec=self.config.detection.tone_release_sec
+            )
+        self.logger = DetectionLogger(
+            self.config.alerts.log_file_path,
+            queue_size=self.config.alerts.log_queue_size,
+            batch_size=self.config.alerts.log_batch_size,
+            flush_interval_sec=self.config.alerts.log_flush_interval_sec,
+            jsonl_file=self.config.alerts.jsonl_log_path or None
         )
-        self.logger = DetectionLogger(self.config.alerts.log_file_path)
         self.display = CLIDisplay()
-        self.data_buffer = DataBuffer(self.config.dashboard.max_history_points)
+        self.detection_store = None
+        if self.config.alerts.detection_store_path:
+            self.detection_store = ColumnarDetectionStore(self.config.alerts.detection_store_path)
+        self.history_store = None
+        if self.config.alerts.history_db_path:
+            self.history_store = SQLiteDetectionStore(self.config.alerts.history_db_path)
+        self.signatures = None
+        if self.config.detection.signature_library_path:
+            try:
+                self.signatures = SignatureLibrary.load(self.config.detection.signature_library_path)
+                self.logger.log_info(f"Loaded {len(self.signatures)} beacon signatures")
+            except (OSError, ValueError, KeyError) as e:
+                self.logger.log_error(f"Failed to load signature library: {e}")
+        self.history = SpectrumHistory(self.config.dashboard.max_history_points)
+        self.rollups = HistoryRollups()
         
         # Detection state
-        self.detection_history = deque(maxlen=50)
+        self.beacon_tracker = BeaconTracker(
+            tolerance_hz=self.config.detection.track_tolerance_hz,
+            window_sec=self.config.detection.repetition_window_sec,
+            repetition_threshold=self.config.detection.repetition_threshold,
+            burst_gap_sec=self.config.detection.track_burst_gap_sec,
+            release_sec=self.config.detection.track_release_sec
+        )
         self.last_alert_time = 0
+        self.last_threat_level = "normal"
         self.running = False
         self.stats = {
             'start_time': time.time(),
@@ -44,42 +128,135 @@ class UltrasonicDetector:
         self.socket = None
         self.connect_attempts = 0
         
+        # Persistent receive buffers (sized for one second of audio, grown on demand)
+        self._header_buffer = bytearray(AUDIO_HEADER.size)
+        self._header_view = memoryview(self._header_buffer)
+        self._raw_buffer = bytearray(0)
+        self._audio_buffer = np.empty(0, dtype=np.float32)
+        self._ensure_capacity(self.config.audio.sample_rate * self.config.audio.channels)
+        
+        # Shared-memory ring transport (mapped in connect_to_audio_source)
+        self._ring_map = None
+        self._ring_header = None
+        self._ring_samples = None
+        
+        # Sliding FFT window fed by hop-sized packets from the capture module
+        self._frame = np.zeros(self.config.audio.fft_window_size, dtype=np.float32)
+        self._last_stats_time = time.time()
+        self._hop_warned = False
+        
+        # Dashboard threads only ever read the latest published snapshot
+        self.snapshot = None
+        self._last_publish_time = 0.0
+        self.updates = UpdateBroadcaster(self.config.dashboard.stream_buffer_size)
+        self.publish_snapshot()
+        
     def connect_to_audio_source(self) -> bool:
         """Connect to the C audio capture module via Unix socket"""
         try:
             self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
             self.socket.connect(self.config.system.socket_path)
+            if self.config.system.audio_transport == 'shm':
+                self._open_shm_ring(self.config.system.shm_ring_path)
             self.logger.log_info("Connected to audio capture module")
             return True
         except Exception as e:
             self.logger.log_error(f"Failed to connect to audio source: {e}")
             return False
     
+    def _open_shm_ring(self, path: str):
+        """Map the shared-memory ring written by audio_capture --shm"""
+        fd = os.open(path, os.O_RDWR)
+        try:
+            self._ring_map = mmap.mmap(fd, 0)
+        finally:
+            os.close(fd)
+        
+        header = np.frombuffer(self._ring_map, dtype=SHM_RING_HEADER, count=1)
+        if header['magic'][0] != SHM_RING_MAGIC or header['version'][0] != SHM_RING_VERSION:
+            del header
+            self._close_shm_ring()
+            raise ConnectionError(f"{path} is not a SilentTrace ring buffer")
+        
+        self._ring_header = header
+        self._ring_samples = np.frombuffer(
+            self._ring_map, dtype=np.int16,
+            offset=SHM_RING_HEADER.itemsize,
+            count=int(header['capacity'][0]) * int(header['channels'][0])
+        )
+        # Start from the live position rather than replaying stale audio
+        self._ring_header['read_pos'] = self._ring_header['write_pos']
+        self.logger.log_info(f"Mapped shared-memory ring {path}")
+    
+    def _close_shm_ring(self):
+        """Release the shared-memory ring mapping"""
+        # Views must be dropped before the mmap can be closed
+        self._ring_header = None
+        self._ring_samples = None
+        if self._ring_map is not None:
+            self._ring_map.close()
+            self._ring_map = None
+    
+    def _read_shm_ring(self) -> np.ndarray:
+        """Normalize all unread ring samples into the persistent float32 buffer"""
+        header = self._ring_header
+        capacity = int(header['capacity'][0])
+        channels = int(header['channels'][0])
+        write_pos = int(header['write_pos'][0])
+        read_pos = int(header['read_pos'][0])
+        
+        if write_pos - read_pos > capacity:
+            self.logger.log_error(f"Shared-memory ring overrun, dropped {write_pos - read_pos - capacity} frames")
+            read_pos = write_pos - capacity
+        
+        num_samples = (write_pos - read_pos) * channels
+        self._ensure_capacity(num_samples)
+        audio_data = self._audio_buffer[:num_samples]
+        
+        # Copy out in at most two contiguous runs around the wrap point
+        start = (read_pos % capacity) * channels
+        first = min(num_samples, capacity * channels - start)
+        np.multiply(self._ring_samples[start:start + first], INT16_SCALE, out=audio_data[:first])
+        np.multiply(self._ring_samples[:num_samples - first], INT16_SCALE, out=audio_data[first:])
+        
+        # Drop any prefix the producer overwrote while we were copying
+        overwritten = int(header['write_pos'][0]) - capacity - read_pos
+        if overwritten > 0:
+            audio_data = audio_data[overwritten * channels:]
+        
+        header['read_pos'] = write_pos
+        return audio_data
+    
     def receive_audio_data(self) -> Dict[str, Any]:
-        """Receive audio data from C module"""
+        """Receive audio data from C module
+
+        Samples are read with recv_into into a persistent int16 buffer and
+        normalized in place into a persistent float32 buffer, so the ingest
+        path allocates nothing per packet. The returned 'audio_data' array is
+        overwritten by the next call. In shared-memory mode the socket only
+        delivers the header as a wakeup and samples come from the ring.
+        """
         try:
             # Receive header (timestamp, sample_rate, buffer_length, channels)
-            header_data = self.socket.recv(16)  # 8+4+4 bytes
-            if len(header_data) != 16:
-                raise ConnectionError("Incomplete header received")
-            
-            timestamp, sample_rate, buffer_length, channels = struct.unpack('QII', header_data)
-            
-            # Receive audio data
-            data_size = buffer_length * channels * 2  # 2 bytes per sample (int16)
-            audio_data_bytes = b''
+            self._recv_exact(self._header_view)
+            timestamp, sample_rate, buffer_length, channels = AUDIO_HEADER.unpack_from(self._header_buffer)
             
-            while len(audio_data_bytes) < data_size:
-                chunk = self.socket.recv(data_size - len(audio_data_bytes))
-                if not chunk:
-                    raise ConnectionError("Connection closed by audio source")
-                audio_data_bytes += chunk
+            if self._ring_samples is not None:
+                return {
+                    'timestamp': timestamp,
+                    'sample_rate': sample_rate,
+                    'audio_data': self._read_shm_ring(),
+                    'channels': channels
+                }
             
-            # Convert to numpy array
-            audio_data = np.frombuffer(audio_data_bytes, dtype=np.int16)
+            # Receive audio data straight into the reusable sample buffer
+            num_samples = buffer_length * channels
+            self._ensure_capacity(num_samples)
+            self._recv_exact(self._raw_view[:num_samples * 2])  # 2 bytes per sample (int16)
             
-            # Normalize to [-1, 1] range
-            audio_data = audio_data.astype(np.float32) / 32768.0
+            # Normalize to [-1, 1] range without temporaries
+            audio_data = self._audio_buffer[:num_samples]
+            np.multiply(self._raw_samples[:num_samples], INT16_SCALE, out=audio_data)
             
             return {
                 'timestamp': timestamp,
@@ -92,125 +269,313 @@ class UltrasonicDetector:
             self.logger.log_error(f"Error receiving audio data: {e}")
             return None
     
-    def analyze_audio_chunk(self, audio_data: np.ndarray) -> Dict[str, Any]:
-        """Analyze audio chunk for ultrasonic signals"""
-        # Compute FFT
-        frequencies, magnitudes = self.processor.compute_fft(audio_data)
-        
-        # Extract ultrasonic band
-        us_freq, us_mag = self.processor.extract_ultrasonic_band(
-            frequencies, magnitudes,
-            self.config.audio.ultrasonic_min_freq,
-            self.config.audio.ultrasonic_max_freq
-        )
+    def _recv_exact(self, view: memoryview):
+        """Fill a memoryview completely from the socket"""
+        received = 0
+        total = len(view)
+        while received < total:
+            count = self.socket.recv_into(view[received:])
+            if count == 0:
+                raise ConnectionError("Connection closed by audio source")
+            received += count
+    
+    def _ensure_capacity(self, num_samples: int):
+        """Grow the persistent receive buffers if a packet does not fit"""
+        if num_samples <= len(self._audio_buffer):
+            return
+        self._raw_buffer = bytearray(num_samples * 2)
+        self._raw_view = memoryview(self._raw_buffer)
+        self._raw_samples = np.frombuffer(self._raw_buffer, dtype=np.int16)
+        self._audio_buffer = np.empty(num_samples, dtype=np.float32)
+    
+    def assemble_frame(self, audio_data: np.ndarray) -> np.ndarray:
+        """Slide a hop of new samples into the persistent analysis frame
+
+        Packets at least as long as the FFT window are returned unchanged so
+        whole recordings can still be analyzed in one call; their tail still
+        becomes the frame the next hop slides into.
+        """
+        hop = len(audio_data)
+        if hop == 0:
+            return self._frame
+        if hop >= len(self._frame):
+            self._frame[:] = audio_data[-len(self._frame):]
+            return audio_data
         
-        # Detect peaks
+        self._frame[:-hop] = self._frame[hop:]
+        self._frame[-hop:] = audio_data
+        return self._frame
+    
+    def analyze_audio_chunk(self, audio_data: np.ndarray, hop_samples: int = None) -> Dict[str, Any]:
+        """Analyze audio chunk for ultrasonic signals
+
+        hop_samples is the number of new samples in an assembled sliding
+        frame; it defaults to the configured STFT hop.
+        """
+        min_freq, max_freq = self.config.get_frequency_range()
+        
+        # Compute the ultrasonic band spectrum; chunks longer than one window
+        # go through the STFT and are collapsed with a per-bin peak hold so
+        # short bursts anywhere in the chunk still register
+        elapsed_sec = len(audio_data) / self.config.audio.sample_rate
+        if len(audio_data) > self.processor.window_size:
+            us_freq, spectrogram = self.processor.compute_stft(audio_data, min_freq, max_freq)
+            us_mag = spectrogram.max(axis=0)
+        else:
+            us_freq, us_mag = self.processor.compute_band_spectrum(audio_data, min_freq, max_freq)
+            spectrogram = us_mag[np.newaxis, :]
+            # An assembled frame advances by the samples received, not the whole window
+            elapsed_sec = hop_samples / self.config.audio.sample_rate if hop_samples else None
+        
+        # Detect peaks against the floor tracked so far (seeded by the first
+        # spectrum), then fold this spectrum into it
+        noise_floor = None
+        if self.noise_floor is not None:
+            if self.noise_floor.floor is None:
+                self.noise_floor.update(us_mag, elapsed_sec)
+            noise_floor = self.noise_floor.floor
         peaks = self.processor.detect_peaks(
             us_mag,
             self.config.detection.threshold_db,
             self.config.detection.min_peak_height,
-            self.config.detection.min_peak_distance
+            self.config.detection.min_peak_distance,
+            noise_floor=noise_floor,
+            min_snr_db=self.config.detection.min_snr_db
         )
+        if self.noise_floor is not None:
+            self.noise_floor.update(us_mag, elapsed_sec)
         
         # Calculate spectral features
         features = self.processor.calculate_spectral_features(us_mag)
         
-        # Determine if detection is significant
-        detections = []
-        if len(peaks) > 0:
-            for peak_idx in peaks:
-                detection = {
-                    'frequency': us_freq[peak_idx],
-                    'magnitude': us_mag[peak_idx],
-                    'peak_index': peak_idx,
-                    'timestamp': time.time(),
-                    'features': features
-                }
-                detections.append(detection)
+        # One compact record per peak; chunk-level features stay in the analysis
+        detections = np.empty(len(peaks), dtype=DETECTION_DTYPE)
+        detections['timestamp'] = time.time()
+        detections['frequency'] = us_freq[peaks]
+        detections['magnitude'] = us_mag[peaks]
+        detections['peak_index'] = peaks
+        detections['chunk'] = self.stats['chunks_processed']
         
-        return {
-            'frequencies': frequencies,
-            'magnitudes': magnitudes,
+        analysis = {
+            'spectrogram': spectrogram,
             'ultrasonic_frequencies': us_freq,
             'ultrasonic_magnitudes': us_mag,
             'peaks': peaks,
             'detections': detections,
-            'features': features
+            'features': features,
+            'band_energy': PeriodicityDetector.band_energy(spectrogram)
         }
+        
+        # Every spectrogram row is one hop of the band-energy envelope
+        if self.periodicity is not None:
+            period, strength = self.periodicity.update(analysis['band_energy'])
+            analysis['periodicity'] = {'period': period, 'strength': strength}
+        
+        # Symbol runs span hops, so the demodulator sees every row; emitters
+        # are taken from beacon tracks seen more than once so stray peaks do
+        # not open streams
+        if self.fsk is not None:
+            seeds = [track.frequency for track in self.beacon_tracker.tracks() if track.repetitions > 1]
+            analysis['fsk_bits'] = self.fsk.update(us_freq, spectrogram, seeds, noise_floor)
+        
+        return analysis
     
-    def evaluate_detection_pattern(self, detections: List[Dict[str, Any]]) -> str:
+    def analyze_audio_chunks(self, batch: np.ndarray, timestamps: np.ndarray = None) -> Dict[str, Any]:
+        """
+        Analyze a (chunks, samples) batch of independent chunks in one pass
+        Intended for offline re-analysis and catch-up; the streaming state
+        (frame assembly, tone tracker) is not touched.
+        Returns structured arrays: 'features' (one FEATURE_DTYPE row per chunk)
+        and 'detections' (DETECTION_DTYPE rows referencing their chunk).
+        """
+        batch = np.atleast_2d(batch)
+        if timestamps is None:
+            timestamps = np.full(len(batch), time.time())
+        min_freq, max_freq = self.config.get_frequency_range()
+        
+        if batch.shape[-1] > self.processor.window_size:
+            us_freq, spectrogram = self.processor.compute_stft(batch, min_freq, max_freq)
+            us_mag = spectrogram.max(axis=1)
+        else:
+            us_freq, us_mag = self.processor.compute_band_spectrum(batch, min_freq, max_freq)
+        
+        # Offline there is no running floor; the per-bin median across the
+        # batch serves as its background estimate
+        noise_floor = None
+        if self.config.detection.adaptive_noise_floor and len(us_mag) > 1:
+            noise_floor = np.median(us_mag, axis=0)
+        
+        features = self.processor.calculate_spectral_features_batch(us_mag)
+        chunks, peaks = self.processor.detect_peaks_batch(
+            us_mag,
+            self.config.detection.threshold_db,
+            self.config.detection.min_peak_height,
+            self.config.detection.min_peak_distance,
+            noise_floor=noise_floor,
+            min_snr_db=self.config.detection.min_snr_db
+        )
+        
+        detections = np.empty(len(peaks), dtype=DETECTION_DTYPE)
+        detections['timestamp'] = np.asarray(timestamps)[chunks]
+        detections['frequency'] = us_freq[peaks]
+        detections['magnitude'] = us_mag[chunks, peaks]
+        detections['peak_index'] = peaks
+        detections['chunk'] = chunks
+        
+        return {
+            'ultrasonic_frequencies': us_freq,
+            'ultrasonic_magnitudes': us_mag,
+            'features': features,
+            'detections': detections
+        }
+    
+    def track_tones(self, audio_data: np.ndarray, analysis: Dict[str, Any]):
+        """Update envelopes of confirmed beacon tones with newly received samples"""
+        if self.tone_tracker is None:
+            return
+        
+        # Ambient noise in a normal room keeps envelopes above any absolute
+        # threshold, so tones live exactly as long as their beacon track
+        self.tone_tracker.retain([track.frequency for track in self.beacon_tracker.tracks()],
+                                 self.config.detection.track_tolerance_hz)
+        tracked, envelopes = self.tone_tracker.update(audio_data)
+        analysis['tracked_tones'] = tracked
+        analysis['tone_envelopes'] = envelopes
+    
+    def evaluate_detection_pattern(self, detections: np.ndarray, periodicity: Dict[str, Any] = None) -> str:
         """Evaluate detection pattern to determine threat level"""
-        if not detections:
+        if len(detections) == 0:
+            self.beacon_tracker.tick()
             return "normal"
         
-        current_time = time.time()
+        # Each beacon track keeps its own repetition window, so separate
+        # emitters are judged independently
+        tracks = self.beacon_tracker.update(detections, time.time())
         
-        # Add detections to history
-        for detection in detections:
-            self.detection_history.append(detection)
-        
-        # Count recent detections
-        recent_detections = [
-            d for d in self.detection_history
-            if current_time - d['timestamp'] <= self.config.detection.repetition_window_sec
-        ]
-        
-        # Check for repetitive pattern
-        if len(recent_detections) >= self.config.detection.repetition_threshold:
-            # Check if frequencies are similar (potential beacon)
-            frequencies = [d['frequency'] for d in recent_detections]
-            freq_std = np.std(frequencies)
-            
-            if freq_std < 100:  # Frequencies within 100Hz - likely same source
-                return "alert"
-            else:
-                return "warning"
-        elif len(detections) > 0:
-            return "warning"
+        if any(track.repetitions >= self.config.detection.repetition_threshold for track in tracks):
+            return "alert"
+        
+        # A strongly periodic band envelope confirms a beacon on its own
+        if (periodicity is not None and periodicity['period'] is not None and
+                periodicity['strength'] >= self.config.detection.periodicity_min_strength):
+            return "alert"
         else:
-            return "normal"
+            return "warning"
+    
+    def match_signatures(self, analysis: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Match confirmed beacon tones and timing against the signature library"""
+        if self.signatures is None:
+            return []
+        
+        tracks = [track for track in self.beacon_tracker.tracks()
+                  if track.repetitions >= self.config.detection.repetition_threshold]
+        tones = [track.frequency for track in tracks]
+        if self.fsk is not None:
+            for stream in self.fsk.streams.values():
+                tones.extend(stream.tones)
+        
+        # Prefer the envelope period; fall back to the most repeated track's
+        period = None
+        periodicity = analysis.get('periodicity')
+        if periodicity and periodicity['strength'] >= self.config.detection.periodicity_min_strength:
+            period = periodicity['period']
+        elif tracks:
+            period = max(tracks, key=lambda track: track.repetitions).period
+        
+        return self.signatures.match(
+            np.array(tones),
+            period_sec=period,
+            symbol_sec=self.config.detection.fsk_symbol_sec or None,
+            min_score=self.config.detection.signature_min_score
+        )
     
     def handle_detections(self, analysis: Dict[str, Any]):
         """Handle detection events with appropriate alerts and logging"""
         detections = analysis['detections']
-        threat_level = self.evaluate_detection_pattern(detections)
+        threat_level = self.evaluate_detection_pattern(detections, analysis.get('periodicity'))
         
         current_time = time.time()
         
         # Update statistics
         self.stats['total_detections'] += len(detections)
+        if self.detection_store is not None and len(detections):
+            self.detection_store.append(detections)
+        if self.history_store is not None:
+            self.history_store.append(detections)
+            if threat_level != self.last_threat_level:
+                self.history_store.record_transition(current_time, self.last_threat_level, threat_level)
+        self.last_threat_level = threat_level
         
         # Display status
         if threat_level == "normal":
             self.display.show_status("Listening... | 🔊 Normal ambient noise", "normal")
-        elif threat_level == "warning" and detections:
+        elif threat_level == "warning" and len(detections) > 0:
             freq = detections[0]['frequency']
             mag = detections[0]['magnitude']
             self.display.show_status(f"Ultrasound spike at {freq:.1f}Hz detected!", "warning")
             
             # Detailed detection display
             if current_time - self.last_alert_time > self.config.alerts.alert_cooldown_sec:
-                self.display.show_detection(freq, mag, detections[0]['features'])
+                self.display.show_detection(freq, mag, analysis['features'])
                 self.last_alert_time = current_time
         elif threat_level == "alert":
             self.display.show_status("Repetitive ultrasonic pulses detected (possible beacon signal)", "alert")
             
+            analysis['signature_matches'] = self.match_signatures(analysis)
+            if analysis['signature_matches']:
+                best = analysis['signature_matches'][0]
+                self.display.show_status(f"Matches known beacon {best['name']} ({best['score']:.0%})", "alert")
+            
+            # Follow confirmed beacon tones without waiting for the next FFT
+            if self.tone_tracker is not None:
+                for track in self.beacon_tracker.tracks():
+                    if track.repetitions >= self.config.detection.repetition_threshold:
+                        self.tone_tracker.track(track.frequency, self.config.detection.track_tolerance_hz)
+            
             # Log critical detection
             if self.config.alerts.enable_file_logging:
                 for detection in detections:
                     self.logger.log_detection({
                         'type': 'repetitive_ultrasonic_beacon',
-                        'frequency': detection['frequency'],
-                        'magnitude': detection['magnitude'],
+                        'frequency': float(detection['frequency']),
+                        'magnitude': float(detection['magnitude']),
                         'threat_level': threat_level,
-                        'features': detection['features']
+                        'signatures': analysis['signature_matches'],
+                        'features': analysis['features']
                     })
         
-        # Store data for dashboard
-        self.data_buffer.add({
-            'analysis': analysis,
+        # Store a compact copy of this hop for the dashboard
+        self.history.add(
+            analysis['ultrasonic_frequencies'],
+            analysis['ultrasonic_magnitudes'],
+            analysis['features'],
+            threat_level,
+            detections,
+            chunk=self.stats['chunks_processed'],
+            timestamp=current_time
+        )
+        self.rollups.add(current_time, analysis['ultrasonic_magnitudes'], len(detections),
+                         float(analysis['band_energy'].max()), threat_level)
+    
+    def publish_update(self, analysis: Dict[str, Any], threat_level: str, current_time: float):
+        """Push this hop's spectrum row, new detections and counters to live dashboard clients"""
+        frequencies = analysis['ultrasonic_frequencies']
+        detections = analysis['detections']
+        self.updates.publish({
+            'time': current_time,
             'threat_level': threat_level,
-            'detections': detections
+            'frequency_start': float(frequencies[0]) if len(frequencies) else 0.0,
+            'frequency_step': float(frequencies[1] - frequencies[0]) if len(frequencies) > 1 else 0.0,
+            'spectrum': np.round(analysis['ultrasonic_magnitudes'], 1).tolist(),
+            'peaks': np.asarray(analysis['peaks']).tolist(),
+            'detections': [{'timestamp': float(d['timestamp']),
+                            'frequency': round(float(d['frequency']), 1),
+                            'magnitude': round(float(d['magnitude']), 1)} for d in detections],
+            'stats': {
+                'runtime': current_time - self.stats['start_time'],
+                'chunks_processed': self.stats['chunks_processed'],
+                'total_detections': self.stats['total_detections']
+            }
         })
     
     def run_analysis_loop(self):
@@ -226,9 +591,20 @@ class UltrasonicDetector:
                 audio_packet = self.receive_audio_data()
                 if audio_packet is None:
                     break
+                hop = len(audio_packet['audio_data'])
+                if hop == 0:
+                    continue  # Shared-memory wakeup for samples already drained
+                if hop != self.processor.hop_size and not self._hop_warned:
+                    # Per-hop timing (periodicity, FSK symbols) assumes the configured hop
+                    self._hop_warned = True
+                    self.logger.log_error(
+                        f"Capture sends {hop}-sample hops but fft_window_size and overlap_ratio give "
+                        f"{self.processor.hop_size}; start audio_capture with --hop {self.processor.hop_size}")
                 
-                # Analyze audio
-                analysis = self.analyze_audio_chunk(audio_packet['audio_data'])
+                # Analyze the FFT window advanced by this hop
+                frame = self.assemble_frame(audio_packet['audio_data'])
+                analysis = self.analyze_audio_chunk(frame, hop)
+                self.track_tones(audio_packet['audio_data'], analysis)
                 
                 # Handle detections
                 self.handle_detections(analysis)
@@ -236,9 +612,18 @@ class UltrasonicDetector:
                 # Update statistics
                 self.stats['chunks_processed'] += 1
                 
-                # Display periodic statistics
-                if self.stats['chunks_processed'] % 10 == 0:
-                    runtime = time.time() - self.stats['start_time']
+                # Stream this hop to live dashboards; snapshots follow at their own pace
+                current_time = time.time()
+                self.publish_update(analysis, self.last_threat_level, current_time)
+                if current_time - self._last_publish_time >= self.config.dashboard.snapshot_interval_sec:
+                    self.publish_snapshot()
+                
+                # Display periodic statistics (hops arrive many times per second)
+                if current_time - self._last_stats_time >= 10:
+                    self._last_stats_time = current_time
+                    if self.detection_store is not None:
+                        self.detection_store.flush()
+                    runtime = current_time - self.stats['start_time']
                     stats_display = {
                         'runtime': f"{runtime:.0f}",
                         'chunks_processed': self.stats['chunks_processed']
@@ -260,18 +645,63 @@ class UltrasonicDetector:
     def cleanup(self):
         """Clean up resources"""
         self.running = False
+        self.publish_snapshot()  # Dashboards show the detector as stopped
         if self.socket:
             self.socket.close()
+        self._close_shm_ring()
+        if self.detection_store is not None:
+            self.detection_store.close()
+            self.detection_store = None
+        if self.history_store is not None:
+            self.history_store.close()
+            self.history_store = None
+        if self.logger.dropped:
+            self.logger.log_error(f"Detection log queue overflowed, dropped {self.logger.dropped} records")
         self.logger.log_info("SilentTrace analysis stopped")
+        self.logger.close()
+    
+    def publish_snapshot(self):
+        """
+        Build dashboard data from the analysis thread and publish it
+        The snapshot is freshly allocated and never modified afterwards;
+        replacing self.snapshot is a single reference assignment, so readers
+        on other threads see either the old or the new snapshot whole,
+        and neither side takes a lock.
+        """
+        snapshot = self.get_dashboard_data()
+        snapshot['rollups'] = self.rollups.snapshot()
+        snapshot['published_at'] = time.time()
+        self._last_publish_time = snapshot['published_at']
+        self.snapshot = snapshot
     
     def get_dashboard_data(self) -> Dict[str, Any]:
         """Get data for web dashboard"""
-        recent_data, timestamps = self.data_buffer.get_recent(60.0)  # Last minute
+        # Hops with detections in the last minute, plus the newest for the spectrum
+        detections = self.history.detections(time.time() - 60.0)
+        recent = self.history.recent(60.0, chunks=np.unique(detections['chunk']))
+        detections = detections[np.isin(detections['chunk'], recent['chunks'])]
+        
+        # Rebuild the per-hop entries the dashboard renders from the compact history
+        recent_data = []
+        for i, chunk in enumerate(recent['chunks']):
+            chunk_detections = detections[detections['chunk'] == chunk]
+            recent_data.append({
+                'analysis': {
+                    'ultrasonic_frequencies': self.history.frequencies,
+                    'ultrasonic_magnitudes': recent['magnitudes'][i],
+                    'peaks': chunk_detections['peak_index'],
+                    'features': {name: float(recent['features'][i][name]) for name in FEATURE_DTYPE.names}
+                },
+                'threat_level': recent['threat_levels'][i],
+                'detections': chunk_detections
+            })
         
         dashboard_data = {
             'status': 'running' if self.running else 'stopped',
             'stats': self.stats.copy(),
-            'recent_detections': recent_data[-10:] if recent_data else [],
+            'recent_detections': recent_data,
+            'beacon_tracks': self.beacon_tracker.summary(),
+            'fsk_streams': self.fsk.summary() if self.fsk is not None else [],
             'config': {
                 'ultrasonic_range': self.config.get_frequency_range(),
                 'threshold_db': self.config.detection.threshold_db,
@@ -279,20 +709,50 @@ class UltrasonicDetector:
         }
         
         dashboard_data['stats']['runtime'] = time.time() - self.stats['start_time']
+        dashboard_data['stats']['log_dropped'] = self.logger.dropped
         
         return dashboard_data
 
 class DashboardDataProvider:
-    """Thread-safe data provider for the web dashboard"""
+    """Thread-safe data provider for the web dashboard
+
+    Serves the detector's published snapshots only; nothing here touches
+    live analysis state, so web requests never block the analysis loop.
+    Callers must treat returned data as read-only.
+    """
     
     def __init__(self, detector: UltrasonicDetector):
         self.detector = detector
-        self._lock = threading.Lock()
     
     def get_data(self) -> Dict[str, Any]:
-        """Thread-safe data access for dashboard"""
-        with self._lock:
-            return self.detector.get_dashboard_data()
+        """Latest published dashboard snapshot"""
+        return self.detector.snapshot
+    
+    def get_rollup(self, seconds: float, max_points: int = 600) -> Dict[str, Any]:
+        """Precomputed history points covering the last N seconds"""
+        return HistoryRollups.select(self.detector.snapshot['rollups'], seconds, max_points)
+    
+    def get_updates(self, after: int, timeout: float = None) -> List[Any]:
+        """Per-hop update messages newer than `after` (see UpdateBroadcaster.wait)"""
+        return self.detector.updates.wait(after, timeout)
+    
+    def latest_update(self) -> int:
+        """Sequence number of the newest update message"""
+        return self.detector.updates.sequence
+    
+    def get_history(self, start_time: float, end_time: float, bucket_sec: int = 60) -> Dict[str, Any]:
+        """Detection counts and threat transitions from the history store"""
+        store = self.detector.history_store
+        if store is None:
+            return {'buckets': [], 'counts': [], 'transitions': []}
+        
+        # SQLite readers use their own connections and never wait on the writer
+        buckets, counts = store.detection_counts(start_time, end_time, bucket_sec)
+        return {
+            'buckets': buckets.tolist(),
+            'counts': counts.tolist(),
+            'transitions': store.transitions_between(start_time, end_time)
+        }
 
 def main():
     """Main entry point"""
@@ -332,7 +792,8 @@ def main():
                 host=config.dashboard.host,
                 port=config.dashboard.port,
                 debug=False,  # Don't use debug mode in thread
-                use_reloader=False
+                use_reloader=False,
+                threaded=True  # Each live update stream holds a request thread
             )
         )
         dashboard_thread.daemon = True
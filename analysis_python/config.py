@@ -25,8 +25,27 @@ class DetectionConfig:
     threshold_db: float = -40.0  # dB threshold for detection
     min_peak_height: float = 0.1  # Normalized peak height
     min_peak_distance: int = 100  # FFT bins
-    repetition_threshold: int = 3  # Number of detections to consider repetitive
+    repetition_threshold: int = 3  # Separate bursts on one frequency to consider repetitive
     repetition_window_sec: int = 10  # Time window for repetition detection
+    adaptive_noise_floor: bool = True  # Detect peaks as SNR over a tracked per-bin noise floor
+    min_snr_db: float = 15.0  # Required peak height above the noise floor
+    noise_floor_time_sec: float = 5.0  # Time constant of the noise floor average
+    noise_floor_max_rise_db: float = 6.0  # Largest upward step a single spectrum can apply
+    track_tolerance_hz: float = 100.0  # Detections this close in frequency belong to one beacon track
+    track_burst_gap_sec: float = 0.25  # Detections closer than this form one burst
+    track_release_sec: float = 60.0  # Drop a beacon track after this long without detections
+    periodicity_detection: bool = True  # Look for a repetition period in the band-energy envelope
+    periodicity_window_sec: float = 30.0  # Envelope history used for the autocorrelation
+    periodicity_max_period_sec: float = 10.0  # Longest repetition period searched
+    periodicity_min_strength: float = 0.6  # Normalized autocorrelation that confirms a beacon
+    fsk_demodulation: bool = True  # Decode FSK bitstreams from detected emitters
+    fsk_span_hz: float = 1000.0  # Sub-band searched for an emitter's symbol tones
+    fsk_symbol_sec: float = 0.0  # Symbol duration; 0 infers it from the shortest tone run
+    fsk_release_sec: float = 5.0  # Forget an emitter after this long without a tone
+    signature_library_path: str = ""  # Compiled .npz (or .json) beacon signatures; empty disables matching
+    signature_min_score: float = 0.7  # Lowest match score reported for a signature
+    tone_tracking: bool = True  # Follow confirmed beacon tones with a sliding DFT
+    tone_release_sec: float = 30.0  # Stop following a tone after this long below threshold
     
 @dataclass
 class AlertConfig:
@@ -35,6 +54,12 @@ class AlertConfig:
     enable_audio_alerts: bool = False
     enable_file_logging: bool = True
     log_file_path: str = "silenttrace_detections.log"
+    jsonl_log_path: str = "silenttrace_detections.jsonl"  # Machine-readable detection log; empty disables
+    detection_store_path: str = ""  # Directory of the columnar detection store; empty disables
+    history_db_path: str = ""  # SQLite detection history backing the dashboard; empty disables
+    log_queue_size: int = 10000  # Detections buffered for the writer thread before dropping
+    log_batch_size: int = 100  # Detections written to disk per batch
+    log_flush_interval_sec: float = 1.0  # Longest a logged detection waits before reaching disk
     alert_cooldown_sec: int = 5  # Minimum time between alerts
 
 @dataclass
@@ -45,11 +70,15 @@ class DashboardConfig:
     debug: bool = False
     auto_refresh_ms: int = 1000  # Dashboard refresh rate
     max_history_points: int = 1000  # Maximum data points to keep
+    snapshot_interval_sec: float = 0.5  # How often the analysis loop publishes dashboard data
+    stream_buffer_size: int = 256  # Per-hop updates kept for live clients that fall behind
 
 @dataclass
 class SystemConfig:
     """System-level configuration"""
     socket_path: str = "/tmp/silenttrace.sock"
+    audio_transport: str = "socket"  # "socket" or "shm" (run audio_capture --shm)
+    shm_ring_path: str = "/dev/shm/silenttrace_ring"
     max_reconnect_attempts: int = 5
     reconnect_delay_sec: int = 2
     enable_debug_logging: bool = False
@@ -106,6 +135,10 @@ class Config:
         if 'SILENTTRACE_DASHBOARD_PORT' in os.environ:
             self.dashboard.port = int(os.environ['SILENTTRACE_DASHBOARD_PORT'])
         
+        # Audio transport
+        if 'SILENTTRACE_TRANSPORT' in os.environ:
+            self.system.audio_transport = os.environ['SILENTTRACE_TRANSPORT']
+        
         # Debug mode
         if 'SILENTTRACE_DEBUG' in os.environ:
             debug_enabled = os.environ['SILENTTRACE_DEBUG'].lower() in ('true', '1', 'yes')
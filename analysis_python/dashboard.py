@@ -7,7 +7,7 @@ Real-time visualization of ultrasonic signal detection data
 import json
 import time
 from datetime import datetime
-from flask import Flask, render_template, jsonify, request
+from flask import Flask, Response, render_template, jsonify, request
 from flask_cors import CORS
 import plotly
 import plotly.graph_objs as go
@@ -15,6 +15,7 @@ import plotly.express as px
 import numpy as np
 
 from config import config
+from utils import DETECTION_DTYPE
 
 def create_dashboard_app(data_provider=None):
     """Create and configure Flask dashboard application"""
@@ -69,26 +70,65 @@ def create_dashboard_app(data_provider=None):
         try:
             data = data_provider.get_data()
             recent_detections = data.get('recent_detections', [])
+            records, sources = collect_detections(recent_detections)
+            
+            # Most recent first, last 20 detections only
+            latest = np.argsort(records['timestamp'])[::-1][:20]
             
             # Format detections for display
             formatted_detections = []
-            for item in recent_detections:
-                detections = item.get('detections', [])
-                threat_level = item.get('threat_level', 'normal')
-                
-                for detection in detections:
-                    formatted_detections.append({
-                        'timestamp': datetime.fromtimestamp(detection['timestamp']).strftime('%H:%M:%S'),
-                        'frequency': round(detection['frequency'], 1),
-                        'magnitude': round(detection['magnitude'], 1),
-                        'threat_level': threat_level,
-                        'features': detection.get('features', {})
-                    })
-            
-            # Sort by timestamp (most recent first)
-            formatted_detections.sort(key=lambda x: x['timestamp'], reverse=True)
-            
-            return jsonify(formatted_detections[:20])  # Return last 20 detections
+            for i in latest:
+                item = recent_detections[sources[i]]
+                formatted_detections.append({
+                    'timestamp': datetime.fromtimestamp(float(records['timestamp'][i])).strftime('%H:%M:%S'),
+                    'frequency': round(float(records['frequency'][i]), 1),
+                    'magnitude': round(float(records['magnitude'][i]), 1),
+                    'threat_level': item.get('threat_level', 'normal'),
+                    'features': item.get('analysis', {}).get('features', {})
+                })
+            
+            return jsonify(formatted_detections)
+        except Exception as e:
+            return jsonify({'error': str(e)}), 500
+    
+    @app.route('/api/stream')
+    def stream_updates():
+        """Server-Sent Events stream of per-hop updates (spectrum row, new detections, counters)"""
+        if not hasattr(data_provider, 'get_updates'):
+            return '', 204  # Clients fall back to polling
+        
+        last_event_id = request.headers.get('Last-Event-ID', '')
+        after = int(last_event_id) if last_event_id.isdigit() else data_provider.latest_update()
+        
+        def events():
+            nonlocal after
+            yield 'retry: 2000\n\n'
+            while True:
+                batch = data_provider.get_updates(after, timeout=15)
+                if batch is None:
+                    # Fell behind the update ring: the client reloads full data
+                    after = data_provider.latest_update()
+                    yield f'id: {after}\nevent: resync\ndata: {{}}\n\n'
+                elif not batch:
+                    yield ': keepalive\n\n'
+                else:
+                    after = batch[-1][0]
+                    yield ''.join(f'id: {sequence}\ndata: {message}\n\n' for sequence, message in batch)
+        
+        return Response(events(), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    
+    @app.route('/api/history')
+    def get_history():
+        """API endpoint for long-range detection history (?hours=24&bucket=60)"""
+        try:
+            hours = float(request.args.get('hours', 24))
+            bucket_sec = int(request.args.get('bucket', 60))
+            if not hasattr(data_provider, 'get_history'):
+                return jsonify({'buckets': [], 'counts': [], 'transitions': []})
+            
+            end_time = time.time()
+            return jsonify(data_provider.get_history(end_time - hours * 3600, end_time, bucket_sec))
         except Exception as e:
             return jsonify({'error': str(e)}), 500
     
@@ -166,31 +206,26 @@ def create_dashboard_app(data_provider=None):
     
     @app.route('/api/plot/history')
     def plot_detection_history():
-        """Generate detection history plot"""
+        """Generate detection history plot (?minutes=5, up to 30 days)"""
         try:
-            data = data_provider.get_data()
-            recent_detections = data.get('recent_detections', [])
-            
-            # Extract detection counts over time
-            detection_times = []
-            detection_counts = []
-            current_time = time.time()
+            minutes = float(request.args.get('minutes', 5))
             
-            # Create time bins (every 10 seconds for the last 5 minutes)
-            time_bins = np.arange(current_time - 300, current_time, 10)
-            counts = np.zeros(len(time_bins))
-            
-            for item in recent_detections:
-                detections = item.get('detections', [])
-                for detection in detections:
-                    det_time = detection['timestamp']
-                    # Find appropriate time bin
-                    bin_idx = np.digitize(det_time, time_bins) - 1
-                    if 0 <= bin_idx < len(counts):
-                        counts[bin_idx] += 1
+            if hasattr(data_provider, 'get_rollup'):
+                # Read the precomputed tier that covers the span in few points
+                rollup = data_provider.get_rollup(minutes * 60)
+                time_bins, counts = rollup['times'], rollup['counts']
+            else:
+                data = data_provider.get_data()
+                records, _ = collect_detections(data.get('recent_detections', []))
+                current_time = time.time()
+                
+                # Create time bins (every 10 seconds for the requested span)
+                time_bins = np.arange(current_time - minutes * 60, current_time, 10)
+                counts, _ = np.histogram(records['timestamp'], bins=np.append(time_bins, time_bins[-1] + 10))
             
             # Convert to datetime for plotting
-            time_labels = [datetime.fromtimestamp(t).strftime('%H:%M:%S') for t in time_bins]
+            label_format = '%H:%M:%S' if minutes <= 24 * 60 else '%m-%d %H:%M'
+            time_labels = [datetime.fromtimestamp(t).strftime(label_format) for t in time_bins]
             
             fig = go.Figure()
             fig.add_trace(go.Bar(
@@ -201,7 +236,7 @@ def create_dashboard_app(data_provider=None):
             ))
             
             fig.update_layout(
-                title='Detection History (Last 5 Minutes)',
+                title=f'Detection History (Last {minutes:g} Minutes)',
                 xaxis_title='Time',
                 yaxis_title='Detection Count',
                 template='plotly_dark',
@@ -231,6 +266,18 @@ def create_dashboard_app(data_provider=None):
     
     return app
 
+def collect_detections(recent_detections):
+    """
+    Concatenate the detection records of recent buffer entries
+    Returns: (DETECTION_DTYPE records, index of the source entry per record)
+    """
+    arrays = [np.asarray(item.get('detections', []), dtype=DETECTION_DTYPE) for item in recent_detections]
+    if not arrays:
+        return np.empty(0, dtype=DETECTION_DTYPE), np.empty(0, dtype=int)
+    
+    sources = np.repeat(np.arange(len(arrays)), [len(a) for a in arrays])
+    return np.concatenate(arrays), sources
+
 def get_dashboard_config():
     """Get configuration data for dashboard"""
     return {
@@ -262,22 +309,20 @@ class MockDataProvider:
         magnitudes = -60 + 20 * np.random.random(100) + 10 * np.sin(frequencies / 1000)
         
         # Add some fake peaks occasionally
-        fake_detections = []
+        fake_detections = np.empty(0, dtype=DETECTION_DTYPE)
+        features = {}
         if np.random.random() < 0.1:  # 10% chance of detection
             self.detection_count += 1
             peak_freq = 19000 + np.random.random() * 2000
             peak_mag = -30 + np.random.random() * 20
             
-            fake_detections.append({
-                'frequency': peak_freq,
-                'magnitude': peak_mag,
-                'timestamp': current_time,
-                'features': {
-                    'peak_magnitude': peak_mag,
-                    'spectral_centroid': 20000,
-                    'spectral_flatness': 0.1
-                }
-            })
+            fake_detections = np.array([(current_time, peak_freq, peak_mag, 50, self.detection_count)],
+                                       dtype=DETECTION_DTYPE)
+            features = {
+                'peak_magnitude': peak_mag,
+                'spectral_centroid': 20000,
+                'spectral_flatness': 0.1
+            }
         
         return {
             'status': 'running',
@@ -290,10 +335,11 @@ class MockDataProvider:
                 'analysis': {
                     'ultrasonic_frequencies': frequencies,
                     'ultrasonic_magnitudes': magnitudes,
-                    'peaks': np.array([20, 50]) if fake_detections else np.array([])
+                    'peaks': np.array([20, 50]) if len(fake_detections) else np.array([], dtype=int),
+                    'features': features
                 },
                 'detections': fake_detections,
-                'threat_level': 'warning' if fake_detections else 'normal'
+                'threat_level': 'warning' if len(fake_detections) else 'normal'
             }],
             'config': {
                 'ultrasonic_range': (18000, 22000),
@@ -417,7 +463,27 @@ dashboard_html = '''<!DOCTYPE html>
     </div>
     
     <script>
+        const REFRESH_MS = {{ config.refresh_rate or 2000 }};
+        const HISTORY_REFRESH_MS = 10000;
+        const spectrumLayout = {
+            title: {text: 'Real-time Ultrasonic Spectrum'},
+            xaxis: {title: {text: 'Frequency (Hz)'}},
+            yaxis: {title: {text: 'Magnitude (dB)'}},
+            paper_bgcolor: '#111111',
+            plot_bgcolor: '#111111',
+            font: {color: '#f2f5fa'},
+            height: 400,
+            showlegend: true,
+            shapes: [{type: 'line', xref: 'paper', x0: 0, x1: 1,
+                      y0: {{ config.threshold_db }}, y1: {{ config.threshold_db }},
+                      line: {color: 'red', dash: 'dash'}}]
+        };
+        
         let refreshInterval;
+        let historyInterval;
+        let source = null;
+        let pendingSpectrum = null;
+        let recentDetections = [];
         
         function updateDashboard() {
             const indicator = document.getElementById('refreshIndicator');
@@ -442,12 +508,23 @@ dashboard_html = '''<!DOCTYPE html>
         function updateStatusCards(data) {
             const statusCard = document.getElementById('statusCard');
             const status = data.status || 'unknown';
-            const stats = data.stats || {};
             
             // Update status
             document.getElementById('systemStatus').textContent = 
                 status === 'running' ? '✅ Active' : '❌ Stopped';
             
+            updateStats(data.stats || {});
+            
+            // Update configuration
+            const config = data.config || {};
+            const range = config.ultrasonic_range || [18000, 22000];
+            document.getElementById('frequencyRange').textContent = 
+                `Range: ${range[0]/1000}-${range[1]/1000}kHz`;
+            document.getElementById('threshold').textContent = 
+                `Threshold: ${config.threshold_db || -40}dB`;
+        }
+        
+        function updateStats(stats) {
             // Update runtime
             const runtime = Math.floor(stats.runtime || 0);
             const hours = Math.floor(runtime / 3600);
@@ -461,14 +538,6 @@ dashboard_html = '''<!DOCTYPE html>
                 `Total Detections: ${stats.total_detections || 0}`;
             document.getElementById('processedChunks').textContent = 
                 `Processed Chunks: ${stats.chunks_processed || 0}`;
-            
-            // Update configuration
-            const config = data.config || {};
-            const range = config.ultrasonic_range || [18000, 22000];
-            document.getElementById('frequencyRange').textContent = 
-                `Range: ${range[0]/1000}-${range[1]/1000}kHz`;
-            document.getElementById('threshold').textContent = 
-                `Threshold: ${config.threshold_db || -40}dB`;
         }
         
         function updatePlots() {
@@ -479,7 +548,10 @@ dashboard_html = '''<!DOCTYPE html>
                     Plotly.newPlot('spectrumPlot', plotData.data, plotData.layout, {responsive: true});
                 });
                 
-            // Update history plot
+            updateHistoryPlot();
+        }
+        
+        function updateHistoryPlot() {
             fetch('/api/plot/history')
                 .then(response => response.json())
                 .then(plotData => {
@@ -491,36 +563,120 @@ dashboard_html = '''<!DOCTYPE html>
             fetch('/api/detections')
                 .then(response => response.json())
                 .then(detections => {
-                    const logContainer = document.getElementById('detectionList');
-                    
-                    if (detections.length === 0) {
-                        logContainer.innerHTML = '<p>No recent detections</p>';
-                        return;
-                    }
-                    
-                    const logHtml = detections.map(det => `
-                        <div class="detection-item ${det.threat_level}">
-                            <strong>${det.timestamp}</strong> - 
-                            ${det.frequency}Hz at ${det.magnitude}dB
-                            <span style="float: right; text-transform: uppercase;">${det.threat_level}</span>
-                        </div>
-                    `).join('');
-                    
-                    logContainer.innerHTML = logHtml;
+                    recentDetections = detections;
+                    renderDetections();
                 });
         }
         
+        function renderDetections() {
+            const logContainer = document.getElementById('detectionList');
+            
+            if (recentDetections.length === 0) {
+                logContainer.innerHTML = '<p>No recent detections</p>';
+                return;
+            }
+            
+            const logHtml = recentDetections.map(det => `
+                <div class="detection-item ${det.threat_level}">
+                    <strong>${det.timestamp}</strong> - 
+                    ${det.frequency}Hz at ${det.magnitude}dB
+                    <span style="float: right; text-transform: uppercase;">${det.threat_level}</span>
+                </div>
+            `).join('');
+            
+            logContainer.innerHTML = logHtml;
+        }
+        
+        function applyUpdate(update) {
+            updateStats(update.stats);
+            
+            // Hops arrive faster than the screen refreshes; draw only the newest
+            if (pendingSpectrum === null) {
+                requestAnimationFrame(drawSpectrum);
+            }
+            pendingSpectrum = update;
+            
+            if (update.detections.length > 0) {
+                const items = update.detections.map(det => ({
+                    timestamp: new Date(det.timestamp * 1000).toLocaleTimeString('en-GB'),
+                    frequency: det.frequency,
+                    magnitude: det.magnitude,
+                    threat_level: update.threat_level
+                }));
+                recentDetections = items.reverse().concat(recentDetections).slice(0, 20);
+                renderDetections();
+            }
+        }
+        
+        function drawSpectrum() {
+            const update = pendingSpectrum;
+            pendingSpectrum = null;
+            
+            const frequencies = update.spectrum.map((_, i) => update.frequency_start + i * update.frequency_step);
+            const traces = [{
+                x: frequencies,
+                y: update.spectrum,
+                mode: 'lines',
+                name: 'Ultrasonic Spectrum',
+                line: {color: 'cyan', width: 2}
+            }];
+            if (update.peaks.length > 0) {
+                traces.push({
+                    x: update.peaks.map(i => frequencies[i]),
+                    y: update.peaks.map(i => update.spectrum[i]),
+                    mode: 'markers',
+                    name: 'Detected Peaks',
+                    marker: {color: 'red', size: 8, symbol: 'triangle-up'}
+                });
+            }
+            Plotly.react('spectrumPlot', traces, spectrumLayout, {responsive: true});
+        }
+        
+        function startLiveUpdates() {
+            if (!window.EventSource) {
+                startPolling();
+                return;
+            }
+            
+            // Load the full state once, then apply per-hop updates pushed by the server
+            updateDashboard();
+            const stream = new EventSource('/api/stream');
+            stream.onmessage = event => applyUpdate(JSON.parse(event.data));
+            stream.addEventListener('resync', updateDashboard);
+            stream.onerror = () => {
+                // Without a live stream (204) the browser gives up on the source
+                if (stream === source && stream.readyState === EventSource.CLOSED) {
+                    startPolling();
+                }
+            };
+            source = stream;
+            historyInterval = setInterval(updateHistoryPlot, HISTORY_REFRESH_MS);
+        }
+        
+        function startPolling() {
+            stopUpdates();
+            updateDashboard();
+            refreshInterval = setInterval(updateDashboard, REFRESH_MS);
+        }
+        
+        function stopUpdates() {
+            if (source !== null) {
+                source.close();
+                source = null;
+            }
+            clearInterval(refreshInterval);
+            clearInterval(historyInterval);
+        }
+        
         // Initialize dashboard
-        updateDashboard();
-        refreshInterval = setInterval(updateDashboard, {{ config.refresh_rate or 2000 }});
+        startLiveUpdates();
         
         // Handle page visibility for performance
         document.addEventListener('visibilitychange', function() {
             if (document.hidden) {
-                clearInterval(refreshInterval);
+                stopUpdates();
             } else {
-                updateDashboard();
-                refreshInterval = setInterval(updateDashboard, {{ config.refresh_rate or 2000 }});
+                startLiveUpdates();
             }
         });
     </script>
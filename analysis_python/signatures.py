@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+SilentTrace Beacon Signature Library
+Known beacon patterns indexed by frequency for fast template matching
+
+Compile a JSON source list into the binary library loaded at startup:
+    python3 signatures.py beacons.json beacons.npz
+"""
+
+import sys
+import json
+import numpy as np
+from typing import List, Dict, Any
+
+class SignatureLibrary:
+    """Frequency-bucketed set of beacon signatures
+    
+    Each signature has up to max_tones tone frequencies and optional symbol
+    duration, repetition period and chirp slope. Every tone (widened by its
+    tolerance) is registered in the bucket_hz buckets it covers, stored as a
+    CSR index: sorted bucket ids with offsets into one member array. A match
+    looks up only the buckets of the observed tones and scores the resulting
+    candidates together, so cost follows the number of overlapping
+    signatures rather than the library size.
+    """
+    
+    def __init__(self, names: np.ndarray, tones: np.ndarray, tolerance_hz: np.ndarray,
+                 period_sec: np.ndarray, symbol_sec: np.ndarray, chirp_slope: np.ndarray,
+                 bucket_hz: float = 100.0):
+        self.names = names
+        self.tones = tones  # (signatures, max_tones), NaN padded
+        self.tolerance_hz = tolerance_hz
+        self.period_sec = period_sec  # 0 where unknown, as are the two below
+        self.symbol_sec = symbol_sec
+        self.chirp_slope = chirp_slope
+        self.bucket_hz = bucket_hz
+        self.n_tones = np.sum(~np.isnan(tones), axis=1)
+        self._build_index()
+    
+    def __len__(self) -> int:
+        return len(self.names)
+    
+    def _build_index(self):
+        """Register every tone in the frequency buckets its tolerance covers"""
+        rows, cols = np.nonzero(~np.isnan(self.tones))
+        freqs = self.tones[rows, cols]
+        tolerance = self.tolerance_hz[rows]
+        first = np.floor((freqs - tolerance) / self.bucket_hz).astype(np.int64)
+        last = np.floor((freqs + tolerance) / self.bucket_hz).astype(np.int64)
+        
+        spans = last - first + 1
+        members = np.repeat(rows, spans)
+        buckets = np.repeat(first, spans) + np.arange(spans.sum()) - np.repeat(np.cumsum(spans) - spans, spans)
+        
+        # Each signature appears once per bucket, ordered by bucket
+        pairs = np.unique(np.stack((buckets, members), axis=1), axis=0)
+        self.bucket_ids, starts = np.unique(pairs[:, 0], return_index=True)
+        self.bucket_offsets = np.append(starts, len(pairs))
+        self.bucket_members = pairs[:, 1]
+    
+    def candidates(self, frequencies: np.ndarray) -> np.ndarray:
+        """Indices of signatures with a tone bucket matching any frequency"""
+        buckets = np.unique(np.floor(np.asarray(frequencies) / self.bucket_hz).astype(np.int64))
+        positions = np.searchsorted(self.bucket_ids, buckets)
+        found = positions < len(self.bucket_ids)
+        positions, buckets = positions[found], buckets[found]
+        positions = positions[self.bucket_ids[positions] == buckets]
+        if len(positions) == 0:
+            return np.zeros(0, dtype=np.int64)
+        
+        slices = [self.bucket_members[self.bucket_offsets[p]:self.bucket_offsets[p + 1]] for p in positions]
+        return np.unique(np.concatenate(slices))
+    
+    def match(self, frequencies: np.ndarray, period_sec: float = None, symbol_sec: float = None,
+              chirp_slope: float = None, min_score: float = 0.0, top_k: int = 3,
+              timing_tolerance: float = 0.2) -> List[Dict[str, Any]]:
+        """
+        Score signatures against observed tones and timings
+        Tone agreement is the F1 of signature tones found and observed tones
+        explained; each timing known on both sides adds a term that falls to
+        zero at timing_tolerance relative error. Tones weigh double.
+        Returns: up to top_k {'name', 'score'} dicts, best first
+        """
+        observed = np.asarray(frequencies, dtype=np.float64)
+        if len(observed) == 0 or len(self) == 0:
+            return []
+        
+        candidates = self.candidates(observed)
+        if len(candidates) == 0:
+            return []
+        
+        tones = self.tones[candidates]
+        tolerance = self.tolerance_hz[candidates, np.newaxis, np.newaxis]
+        hit = np.abs(tones[:, :, np.newaxis] - observed) <= tolerance  # (candidates, tones, observed)
+        recall = hit.any(axis=2).sum(axis=1) / self.n_tones[candidates]
+        precision = hit.any(axis=1).sum(axis=1) / len(observed)
+        tone_score = np.where(recall + precision > 0, 2 * recall * precision / np.maximum(recall + precision, 1e-12), 0)
+        
+        total = 2 * tone_score
+        weight = np.full(len(candidates), 2.0)
+        for observed_value, reference in ((period_sec, self.period_sec), (symbol_sec, self.symbol_sec),
+                                          (chirp_slope, self.chirp_slope)):
+            if not observed_value:
+                continue
+            reference = reference[candidates]
+            known = reference != 0
+            error = np.abs(observed_value - reference) / np.where(known, np.abs(reference), 1)
+            total += np.where(known, np.clip(1 - error / timing_tolerance, 0, 1), 0)
+            weight += known
+        score = total / weight
+        
+        order = np.argsort(-score)[:top_k]
+        return [{'name': str(self.names[candidates[i]]), 'score': float(score[i])}
+                for i in order if score[i] >= min_score]
+    
+    @classmethod
+    def from_records(cls, records: List[Dict[str, Any]], default_tolerance_hz: float = 50.0,
+                     bucket_hz: float = 100.0) -> 'SignatureLibrary':
+        """Build from dicts with name, tones and optional tolerance_hz, period_sec, symbol_sec, chirp_slope"""
+        max_tones = max((len(r['tones']) for r in records), default=1)
+        tones = np.full((len(records), max_tones), np.nan, dtype=np.float32)
+        for i, record in enumerate(records):
+            tones[i, :len(record['tones'])] = record['tones']
+        
+        def column(key, default=0.0):
+            return np.array([record.get(key) or default for record in records], dtype=np.float32)
+        
+        return cls(
+            names=np.array([record['name'] for record in records], dtype=str),
+            tones=tones,
+            tolerance_hz=column('tolerance_hz', default_tolerance_hz),
+            period_sec=column('period_sec'),
+            symbol_sec=column('symbol_sec'),
+            chirp_slope=column('chirp_slope'),
+            bucket_hz=bucket_hz
+        )
+    
+    def save(self, path: str):
+        """Write the compiled library, index included, as an uncompressed .npz"""
+        np.savez(path, names=self.names, tones=self.tones, tolerance_hz=self.tolerance_hz,
+                 period_sec=self.period_sec, symbol_sec=self.symbol_sec, chirp_slope=self.chirp_slope,
+                 bucket_hz=self.bucket_hz, bucket_ids=self.bucket_ids,
+                 bucket_offsets=self.bucket_offsets, bucket_members=self.bucket_members)
+    
+    @classmethod
+    def load(cls, path: str) -> 'SignatureLibrary':
+        """Load a compiled .npz library, or compile a .json source on the fly"""
+        if path.endswith('.json'):
+            with open(path, 'r') as f:
+                return cls.from_records(json.load(f))
+        
+        with np.load(path, allow_pickle=False) as data:
+            library = cls.__new__(cls)
+            for key in ('names', 'tones', 'tolerance_hz', 'period_sec', 'symbol_sec', 'chirp_slope',
+                        'bucket_ids', 'bucket_offsets', 'bucket_members'):
+                setattr(library, key, data[key])
+            library.bucket_hz = float(data['bucket_hz'])
+        library.n_tones = np.sum(~np.isnan(library.tones), axis=1)
+        return library
+
+def main():
+    """Compile a JSON signature list into a binary library"""
+    if len(sys.argv) != 3:
+        print("Usage: python3 signatures.py <signatures.json> <library.npz>")
+        sys.exit(1)
+    
+    library = SignatureLibrary.load(sys.argv[1])
+    library.save(sys.argv[2])
+    print(f"Compiled {len(library)} signatures into {sys.argv[2]}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,343 @@
+"""
+SilentTrace Detection Storage
+Persistent, queryable detection history
+"""
+
+import os
+import time
+import queue
+import sqlite3
+import threading
+import numpy as np
+from typing import List, Tuple, Dict, Any
+
+from utils import DETECTION_DTYPE
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet export is optional
+    pa = None
+    pq = None
+
+class ColumnarDetectionStore:
+    """Append-only columnar store of detection records
+    
+    Every DETECTION_DTYPE field is a raw little-endian column file in one
+    directory and is read back through np.memmap, so queries only touch the
+    pages they need. Records must arrive in timestamp order. index.f8 holds
+    the first timestamp of every block_size rows, a sparse time index that
+    takes a range query straight to its first block without scanning.
+    """
+    
+    def __init__(self, path: str, block_size: int = 4096):
+        self.path = path
+        self.block_size = block_size
+        os.makedirs(path, exist_ok=True)
+        
+        self._files = {name: open(self._column_path(name), 'ab') for name in DETECTION_DTYPE.names}
+        self._index_file = open(os.path.join(path, 'index.f8'), 'ab')
+        self._rows = self._stored_rows()
+        self._repair()
+        self._maps = {}
+        self._mapped_rows = -1
+    
+    def _column_path(self, name: str) -> str:
+        return os.path.join(self.path, f"{name}.{DETECTION_DTYPE[name].str.lstrip('<>|=')}")
+    
+    def _stored_rows(self) -> int:
+        """Rows present in every column (a torn write leaves some longer)"""
+        return min(os.path.getsize(self._column_path(name)) // DETECTION_DTYPE[name].itemsize
+                   for name in DETECTION_DTYPE.names)
+    
+    def _repair(self):
+        """Cut every column back to the rows all columns hold and fit the index to them
+
+        A torn write leaves some columns (or the index) longer than the rest;
+        appending after that tail would misalign the columns for good.
+        """
+        for name in DETECTION_DTYPE.names:
+            self._files[name].truncate(self._rows * DETECTION_DTYPE[name].itemsize)
+        
+        blocks = -(-self._rows // self.block_size)
+        index_path = os.path.join(self.path, 'index.f8')
+        indexed = min(os.path.getsize(index_path) // 8, blocks)
+        self._index_file.truncate(indexed * 8)
+        if indexed < blocks:
+            timestamps = np.fromfile(self._column_path('timestamp'), dtype='<f8')
+            self._index_file.write(timestamps[indexed * self.block_size::self.block_size].tobytes())
+            self._index_file.flush()
+    
+    def __len__(self) -> int:
+        return self._rows
+    
+    def append(self, detections: np.ndarray):
+        """Append detection records (buffered; visible to queries after flush)"""
+        if len(detections) == 0:
+            return
+        
+        for name, f in self._files.items():
+            f.write(np.ascontiguousarray(detections[name], dtype=DETECTION_DTYPE[name].newbyteorder('<')).tobytes())
+        
+        # Index the first timestamp of every block this batch starts
+        first_block = -(-self._rows // self.block_size)
+        self._rows += len(detections)
+        starts = np.arange(first_block * self.block_size, self._rows, self.block_size)
+        if len(starts):
+            offset = self._rows - len(detections)
+            self._index_file.write(detections['timestamp'][starts - offset].astype('<f8').tobytes())
+    
+    def flush(self):
+        for f in self._files.values():
+            f.flush()
+        self._index_file.flush()
+    
+    def close(self):
+        self.flush()
+        for f in self._files.values():
+            f.close()
+        self._index_file.close()
+    
+    def _columns(self) -> Dict[str, np.ndarray]:
+        """Memory maps of all columns, remapped when rows were flushed since"""
+        rows = self._stored_rows()
+        if rows != self._mapped_rows:
+            self._maps = {
+                name: np.memmap(self._column_path(name), dtype=DETECTION_DTYPE[name].newbyteorder('<'),
+                                mode='r', shape=(rows,)) if rows else np.zeros(0, DETECTION_DTYPE[name])
+                for name in DETECTION_DTYPE.names
+            }
+            index_path = os.path.join(self.path, 'index.f8')
+            blocks = min(os.path.getsize(index_path) // 8, -(-rows // self.block_size))
+            self._maps['_index'] = np.fromfile(index_path, dtype='<f8', count=blocks)
+            self._mapped_rows = rows
+        return self._maps
+    
+    def query(self, start_time: float = -np.inf, end_time: float = np.inf) -> np.ndarray:
+        """Detections with start_time <= timestamp <= end_time, as DETECTION_DTYPE records"""
+        columns = self._columns()
+        rows = self._mapped_rows
+        index = columns['_index']
+        
+        # Sparse index narrows the range to whole blocks; then search within
+        # A block starting exactly at start_time may continue rows of the same
+        # timestamp from the block before it
+        first_block = max(int(np.searchsorted(index, start_time, side='left')) - 1, 0)
+        last_block = int(np.searchsorted(index, end_time, side='right'))
+        lo = first_block * self.block_size
+        hi = min(last_block * self.block_size, rows)
+        timestamps = columns['timestamp'][lo:hi]
+        begin = lo + int(np.searchsorted(timestamps, start_time, side='left'))
+        end = lo + int(np.searchsorted(timestamps, end_time, side='right'))
+        
+        result = np.empty(max(end - begin, 0), dtype=DETECTION_DTYPE)
+        for name in DETECTION_DTYPE.names:
+            result[name] = columns[name][begin:end]
+        return result
+    
+    def export_parquet(self, path: str, start_time: float = -np.inf, end_time: float = np.inf):
+        """Write a time range to a Parquet file (requires pyarrow)"""
+        if pq is None:
+            raise RuntimeError("Parquet export requires pyarrow (pip install pyarrow)")
+        
+        records = self.query(start_time, end_time)
+        table = pa.table({name: records[name] for name in DETECTION_DTYPE.names})
+        pq.write_table(table, path)
+
+class SQLiteDetectionStore:
+    """Embedded SQLite history of detections and threat-level transitions
+    
+    The database runs in WAL mode so dashboard readers never block the
+    writer. Inserts are queued and committed in batches by one writer thread
+    that owns the write connection; every reading thread gets its own
+    read-only connection. The writer also keeps per-minute detection counts
+    in detection_minutes, so month-long history views read one row per
+    minute instead of every detection.
+    """
+    
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS detections (
+            timestamp REAL NOT NULL,
+            frequency REAL NOT NULL,
+            magnitude REAL NOT NULL,
+            peak_index INTEGER NOT NULL,
+            chunk INTEGER NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_detections_timestamp ON detections (timestamp);
+        CREATE INDEX IF NOT EXISTS idx_detections_frequency ON detections (frequency);
+        CREATE TABLE IF NOT EXISTS detection_minutes (
+            minute INTEGER PRIMARY KEY,
+            count INTEGER NOT NULL,
+            max_magnitude REAL NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS threat_transitions (
+            timestamp REAL NOT NULL,
+            from_level TEXT,
+            to_level TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_transitions_timestamp ON threat_transitions (timestamp);
+    """
+    
+    def __init__(self, path: str, batch_size: int = 500, flush_interval_sec: float = 1.0,
+                 queue_size: int = 10000):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval_sec = flush_interval_sec
+        self.dropped = 0
+        
+        # Create the schema and switch to WAL before readers can appear
+        connection = sqlite3.connect(path)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.executescript(self.SCHEMA)
+        connection.close()
+        
+        self._local = threading.local()
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._writer = threading.Thread(target=self._write_loop, name="SQLiteDetectionStore", daemon=True)
+        self._writer.start()
+    
+    def append(self, detections: np.ndarray):
+        """Queue detection records for the writer (never blocks)"""
+        if len(detections):
+            self._enqueue(('detections', detections.copy()))
+    
+    def record_transition(self, timestamp: float, from_level: str, to_level: str):
+        """Queue a threat-level change"""
+        self._enqueue(('transition', (timestamp, from_level, to_level)))
+    
+    def _enqueue(self, item):
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            self.dropped += 1
+    
+    def _write_loop(self):
+        """Commit queued rows in batches until the close sentinel arrives"""
+        connection = sqlite3.connect(self.path)
+        connection.execute("PRAGMA synchronous=NORMAL")  # Safe under WAL, far fewer fsyncs
+        detections, transitions = [], []
+        pending = 0
+        last_commit = time.monotonic()
+        running = True
+        while running:
+            try:
+                item = self._queue.get(timeout=self.flush_interval_sec)
+            except queue.Empty:
+                item = ()
+            if item is None:
+                running = False
+            elif item:
+                kind, payload = item
+                if kind == 'detections':
+                    detections.append(payload)
+                    pending += len(payload)
+                else:
+                    transitions.append(payload)
+                    pending += 1
+            
+            if pending and (not running or pending >= self.batch_size or
+                            time.monotonic() - last_commit >= self.flush_interval_sec):
+                self._commit(connection, detections, transitions)
+                detections, transitions = [], []
+                pending = 0
+                last_commit = time.monotonic()
+        
+        connection.close()
+    
+    def _commit(self, connection: sqlite3.Connection, detections: List[np.ndarray], transitions: List[tuple]):
+        with connection:
+            if detections:
+                records = np.concatenate(detections)
+                connection.executemany(
+                    "INSERT INTO detections VALUES (?, ?, ?, ?, ?)",
+                    zip(records['timestamp'].tolist(), records['frequency'].tolist(),
+                        records['magnitude'].tolist(), records['peak_index'].tolist(),
+                        records['chunk'].tolist())
+                )
+                
+                minutes, inverse, counts = np.unique((records['timestamp'] // 60).astype(np.int64),
+                                                     return_inverse=True, return_counts=True)
+                peaks = np.full(len(minutes), -np.inf)
+                np.maximum.at(peaks, inverse, records['magnitude'])
+                connection.executemany(
+                    "INSERT INTO detection_minutes VALUES (?, ?, ?) ON CONFLICT (minute) DO UPDATE SET "
+                    "count = count + excluded.count, max_magnitude = MAX(max_magnitude, excluded.max_magnitude)",
+                    zip(minutes.tolist(), counts.tolist(), peaks.tolist())
+                )
+            if transitions:
+                connection.executemany("INSERT INTO threat_transitions VALUES (?, ?, ?)", transitions)
+    
+    def _reader(self) -> sqlite3.Connection:
+        """This thread's read-only connection"""
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+            self._local.connection = connection
+        return connection
+    
+    def detections_between(self, start_time: float, end_time: float, min_freq: float = None,
+                           max_freq: float = None, limit: int = None) -> np.ndarray:
+        """Detections in a time (and optional frequency) range as DETECTION_DTYPE records"""
+        sql = ("SELECT timestamp, frequency, magnitude, peak_index, chunk FROM detections "
+               "WHERE timestamp BETWEEN ? AND ?")
+        params = [start_time, end_time]
+        if min_freq is not None:
+            sql += " AND frequency >= ?"
+            params.append(min_freq)
+        if max_freq is not None:
+            sql += " AND frequency <= ?"
+            params.append(max_freq)
+        sql += " ORDER BY timestamp"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        
+        rows = self._reader().execute(sql, params).fetchall()
+        return np.array(rows, dtype=DETECTION_DTYPE) if rows else np.empty(0, dtype=DETECTION_DTYPE)
+    
+    def detection_counts(self, start_time: float, end_time: float,
+                         bucket_sec: int = 60) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Detection counts per time bucket
+        Whole-minute buckets are summed from detection_minutes; others
+        group the raw detections.
+        Returns: (bucket start times, counts) for non-empty buckets
+        """
+        if bucket_sec == 60:
+            rows = self._reader().execute(
+                "SELECT minute * 60, count FROM detection_minutes WHERE minute BETWEEN ? AND ? ORDER BY minute",
+                (int(start_time // 60), int(end_time // 60))
+            ).fetchall()
+        elif bucket_sec % 60 == 0:
+            step = bucket_sec // 60
+            rows = self._reader().execute(
+                "SELECT (minute / ?) * ? * 60, SUM(count) FROM detection_minutes "
+                "WHERE minute BETWEEN ? AND ? GROUP BY minute / ? ORDER BY 1",
+                (step, step, int(start_time // 60), int(end_time // 60), step)
+            ).fetchall()
+        else:
+            rows = self._reader().execute(
+                "SELECT CAST(timestamp / ? AS INTEGER) * ?, COUNT(*) FROM detections "
+                "WHERE timestamp BETWEEN ? AND ? GROUP BY CAST(timestamp / ? AS INTEGER) ORDER BY 1",
+                (bucket_sec, bucket_sec, start_time, end_time, bucket_sec)
+            ).fetchall()
+        
+        if not rows:
+            return np.empty(0), np.empty(0, dtype=np.int64)
+        starts, counts = zip(*rows)
+        return np.array(starts, dtype=np.float64), np.array(counts, dtype=np.int64)
+    
+    def transitions_between(self, start_time: float, end_time: float) -> List[Dict[str, Any]]:
+        """Threat-level changes in a time range, oldest first"""
+        rows = self._reader().execute(
+            "SELECT timestamp, from_level, to_level FROM threat_transitions "
+            "WHERE timestamp BETWEEN ? AND ? ORDER BY timestamp",
+            (start_time, end_time)
+        ).fetchall()
+        return [{'timestamp': t, 'from_level': a, 'to_level': b} for t, a, b in rows]
+    
+    def close(self, timeout: float = 5.0):
+        """Commit queued rows and stop the writer thread"""
+        if self._writer.is_alive():
+            self._queue.put(None)
+            self._writer.join(timeout)
@@ -0,0 +1,21 @@
+"""Round-trip checks for the persistent detection stores"""
+
+import numpy as np
+
+from storage import ColumnarDetectionStore
+from utils import DETECTION_DTYPE
+
+def test_columnar_query_keeps_duplicate_timestamps_across_blocks(tmp_path):
+    # Three detections per hop share a timestamp; blocks of four split them
+    records = np.zeros(30, dtype=DETECTION_DTYPE)
+    records['timestamp'] = np.repeat(np.arange(100.0, 110.0), 3)
+    records['chunk'] = np.arange(30)
+    
+    store = ColumnarDetectionStore(str(tmp_path), block_size=4)
+    store.append(records)
+    store.flush()
+    
+    assert len(store.query(102, 104.5)) == 9
+    assert len(store.query(105, 105)) == 3
+    assert len(store.query()) == 30
+    store.close()
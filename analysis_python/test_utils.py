@@ -0,0 +1,48 @@
+"""Consistency checks for the vectorized signal processing paths"""
+
+import numpy as np
+
+from utils import SignalProcessor, SpectrumHistory, FEATURE_DTYPE, DETECTION_DTYPE
+
+def synthetic_spectra(rows: int = 64, bins: int = 372, seed: int = 0) -> np.ndarray:
+    """dB spectra with three tones over a noisy floor per row"""
+    rng = np.random.default_rng(seed)
+    x = np.arange(bins)
+    spectra = -70 + 3 * rng.standard_normal((rows, bins))
+    for row in spectra:
+        for center in rng.uniform(5, bins - 5, size=3):
+            row += 45 * np.exp(-0.5 * ((x - center) / 2.0) ** 2)
+    return spectra
+
+def per_row_peaks(processor: SignalProcessor, spectra: np.ndarray, **kwargs) -> set:
+    return {(chunk, int(peak)) for chunk, row in enumerate(spectra)
+            for peak in processor.detect_peaks(row, **kwargs)}
+
+def test_detect_peaks_batch_matches_detect_peaks():
+    processor = SignalProcessor()
+    spectra = synthetic_spectra()
+    
+    for min_distance in (1, 10, 100):
+        chunks, bins = processor.detect_peaks_batch(spectra, min_distance=min_distance)
+        assert set(zip(chunks.tolist(), bins.tolist())) == per_row_peaks(processor, spectra, min_distance=min_distance)
+
+def test_detect_peaks_batch_matches_detect_peaks_with_noise_floor():
+    processor = SignalProcessor()
+    spectra = synthetic_spectra(seed=1)
+    noise_floor = np.full(spectra.shape[1], -70.0)
+    
+    chunks, bins = processor.detect_peaks_batch(spectra, noise_floor=noise_floor)
+    assert set(zip(chunks.tolist(), bins.tolist())) == per_row_peaks(processor, spectra, noise_floor=noise_floor)
+
+def test_spectrum_history_round_trips_tone_levels():
+    processor = SignalProcessor()
+    history = SpectrumHistory(max_size=4)
+    t = np.arange(processor.window_size) / processor.sample_rate
+    features = {name: 0.0 for name in FEATURE_DTYPE.names}
+    
+    # -40 dBFS and full-scale tones peak far above 0 dB on this scale
+    for chunk, amplitude in enumerate((0.01, 1.0)):
+        frequencies, magnitudes = processor.compute_band_spectrum(amplitude * np.sin(2 * np.pi * 19500 * t))
+        history.add(frequencies, magnitudes, features, 'normal', np.empty(0, dtype=DETECTION_DTYPE), chunk)
+        stored = history.recent(limit=1)['magnitudes'][0]
+        assert abs(stored.max() - magnitudes.max()) <= history.quantizer.step_db / 2 + 1e-4
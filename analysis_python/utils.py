@@ -6,11 +6,16 @@ Common utilities for signal processing, logging, and data management
 import numpy as np
 import time
 import logging
+import logging.handlers
+import queue
+import threading
 import json
+import bisect
 from datetime import datetime
-from typing import List, Tuple, Dict, Any
+from collections import deque
+from typing import List, Tuple, Dict, Any, Iterator
 from scipy import signal
-from scipy.fft import fft, fftfreq
+from scipy.fft import rfft, rfftfreq
 from colorama import init, Fore, Back, Style
 from rich.console import Console
 from rich.text import Text
@@ -22,51 +27,139 @@ init(autoreset=True)
 # Rich console for enhanced CLI output
 console = Console()
 
+# Structured record layouts for vectorized (batch) analysis results
+FEATURE_DTYPE = np.dtype([
+    ('peak_magnitude', np.float32),
+    ('mean_magnitude', np.float32),
+    ('std_magnitude', np.float32),
+    ('spectral_centroid', np.float32),
+    ('spectral_rolloff', np.float32),
+    ('spectral_flatness', np.float32)
+])
+
+DETECTION_DTYPE = np.dtype([
+    ('timestamp', np.float64),
+    ('frequency', np.float32),
+    ('magnitude', np.float32),
+    ('peak_index', np.int32),
+    ('chunk', np.int32)
+])
+
 class SignalProcessor:
     """Advanced signal processing utilities for ultrasonic detection"""
     
-    def __init__(self, sample_rate: int = 44100, window_size: int = 4096):
+    def __init__(self, sample_rate: int = 44100, window_size: int = 4096, overlap_ratio: float = 0.5):
         self.sample_rate = sample_rate
         self.window_size = window_size
-        self.window = signal.windows.hann(window_size)
+        self.hop_size = max(1, int(window_size * (1 - overlap_ratio)))
+        self.window = signal.windows.hann(window_size).astype(np.float32)
         
+        # Frequency axis and band slices depend only on sample rate and window size
+        self.frequencies = rfftfreq(window_size, 1/sample_rate)
+        self._band_slices = {}
+        
+    def band_slice(self, min_freq: float, max_freq: float) -> slice:
+        """Contiguous bin range covering [min_freq, max_freq], cached per band"""
+        key = (min_freq, max_freq)
+        band = self._band_slices.get(key)
+        if band is None:
+            start = np.searchsorted(self.frequencies, min_freq, side='left')
+            stop = np.searchsorted(self.frequencies, max_freq, side='right')
+            band = self._band_slices[key] = slice(int(start), int(stop))
+        return band
+    
+    def _frame_spectrum(self, audio_data: np.ndarray) -> np.ndarray:
+        """Windowed real FFT of a single frame (truncated or zero-padded to window_size)"""
+        audio_data = audio_data[..., :self.window_size]
+        windowed_data = audio_data * self.window[:audio_data.shape[-1]]
+        return rfft(windowed_data, n=self.window_size, axis=-1)
+    
     def compute_fft(self, audio_data: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
         """
         Compute FFT with proper windowing and normalization
         Returns: (frequencies, magnitudes)
         """
-        # Apply window function to reduce spectral leakage
-        windowed_data = audio_data * self.window[:len(audio_data)]
-        
-        # Compute FFT
-        fft_result = fft(windowed_data, n=self.window_size)
-        frequencies = fftfreq(self.window_size, 1/self.sample_rate)
-        
-        # Take only positive frequencies and compute magnitude
-        positive_freq_idx = frequencies >= 0
-        frequencies = frequencies[positive_freq_idx]
-        magnitudes = np.abs(fft_result[positive_freq_idx])
+        magnitudes = np.abs(self._frame_spectrum(audio_data))
         
         # Convert to dB scale
         magnitudes_db = 20 * np.log10(magnitudes + 1e-10)  # Add small value to avoid log(0)
         
-        return frequencies, magnitudes_db
+        return self.frequencies, magnitudes_db
+    
+    def compute_band_spectrum(self, audio_data: np.ndarray, min_freq: int = 18000,
+                              max_freq: int = 22000) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Compute the dB spectrum of a single frame restricted to one band
+        Only the band bins are converted to dB. A (chunks, samples) batch
+        gives one spectrum per row.
+        Returns: (band_frequencies, band_magnitudes)
+        """
+        band = self.band_slice(min_freq, max_freq)
+        magnitudes = np.abs(self._frame_spectrum(audio_data)[..., band])
+        return self.frequencies[band], 20 * np.log10(magnitudes + 1e-10)
+    
+    def compute_stft(self, audio_data: np.ndarray, min_freq: float = None,
+                     max_freq: float = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Short-time Fourier transform over the whole chunk
+        Frames are taken from a strided view of the input and transformed with
+        one batched real FFT. A final frame aligned to the end of the chunk
+        covers any tail samples left over by the hop grid. When a band is
+        given only its bins are converted to dB. A (chunks, samples) batch
+        is transformed in the same single FFT call.
+        Returns: (frequencies, spectrogram_db) with shape ([chunks,] frames, bins)
+        """
+        length = audio_data.shape[-1]
+        if length < self.window_size:
+            padding = [(0, 0)] * (audio_data.ndim - 1) + [(0, self.window_size - length)]
+            audio_data = np.pad(audio_data, padding)
+        
+        frames = np.lib.stride_tricks.sliding_window_view(audio_data, self.window_size, axis=-1)
+        last = frames.shape[-2] - 1
+        starts = np.arange(0, last + 1, self.hop_size)
+        if starts[-1] != last:
+            starts = np.append(starts, last)
+        
+        # Gathering the frames is the only copy; windowing happens in place
+        windowed = frames[..., starts, :]
+        windowed *= self.window.astype(windowed.dtype, copy=False)
+        
+        spectrum = rfft(windowed, axis=-1)
+        band = slice(None)
+        if min_freq is not None and max_freq is not None:
+            band = self.band_slice(min_freq, max_freq)
+        spectrogram_db = 20 * np.log10(np.abs(spectrum[..., band]) + 1e-10)
+        
+        return self.frequencies[band], spectrogram_db
     
     def extract_ultrasonic_band(self, frequencies: np.ndarray, magnitudes: np.ndarray, 
                                min_freq: int = 18000, max_freq: int = 22000) -> Tuple[np.ndarray, np.ndarray]:
         """Extract the ultrasonic frequency band"""
+        if frequencies is self.frequencies:
+            band = self.band_slice(min_freq, max_freq)
+            return frequencies[band], magnitudes[..., band]
         mask = (frequencies >= min_freq) & (frequencies <= max_freq)
-        return frequencies[mask], magnitudes[mask]
+        return frequencies[mask], magnitudes[..., mask]
     
     def detect_peaks(self, magnitudes: np.ndarray, threshold_db: float = -40.0, 
-                    min_height: float = 0.1, min_distance: int = 100) -> np.ndarray:
-        """Detect significant peaks in the spectrum"""
-        # Normalize magnitudes for peak detection
-        normalized_mag = (magnitudes - np.min(magnitudes)) / (np.max(magnitudes) - np.min(magnitudes))
+                    min_height: float = 0.1, min_distance: int = 100,
+                    noise_floor: np.ndarray = None, min_snr_db: float = 15.0) -> np.ndarray:
+        """
+        Detect significant peaks in the spectrum
+        With a per-bin noise_floor, peaks must stand min_snr_db above it;
+        otherwise min_height applies to the min-max normalized spectrum.
+        """
+        if noise_floor is not None:
+            # Peak height measured as SNR over the tracked noise floor
+            height_mag = magnitudes - noise_floor
+            min_height = min_snr_db
+        else:
+            # Normalize magnitudes for peak detection
+            height_mag = (magnitudes - np.min(magnitudes)) / (np.max(magnitudes) - np.min(magnitudes))
         
         # Find peaks above threshold
         peaks, properties = signal.find_peaks(
-            normalized_mag,
+            height_mag,
             height=min_height,
             distance=min_distance
         )
@@ -76,39 +169,482 @@ class SignalProcessor:
         
         return valid_peaks
     
+    def detect_peaks_batch(self, magnitudes: np.ndarray, threshold_db: float = -40.0,
+                           min_height: float = 0.1, min_distance: int = 100,
+                           noise_floor: np.ndarray = None, min_snr_db: float = 15.0) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Vectorized detect_peaks over a (chunks, bins) matrix
+        Candidates are interior local maxima of the height signal (SNR with
+        noise_floor, per bin or per chunk and bin, else the normalized
+        spectrum) that pass the height test, as in find_peaks. Only rows with
+        candidates closer than min_distance need find_peaks' greedy distance
+        suppression, so just those rows go through find_peaks. Matches
+        detect_peaks except on flat-topped peaks.
+        Returns: (chunk_indices, bin_indices)
+        """
+        if noise_floor is not None:
+            height = magnitudes - noise_floor
+            min_height = min_snr_db
+        else:
+            low = magnitudes.min(axis=-1, keepdims=True)
+            span = magnitudes.max(axis=-1, keepdims=True) - low
+            height = (magnitudes - low) / np.where(span > 0, span, 1)
+        
+        is_peak = np.zeros(magnitudes.shape, dtype=bool)
+        is_peak[:, 1:-1] = (height[:, 1:-1] > height[:, :-2]) & (height[:, 1:-1] >= height[:, 2:])
+        is_peak &= height >= min_height
+        
+        if min_distance > 1:
+            chunks, bins = np.nonzero(is_peak)
+            crowded = (np.diff(chunks) == 0) & (np.diff(bins) < min_distance)
+            for row in np.unique(chunks[1:][crowded]):
+                kept, _ = signal.find_peaks(height[row], height=min_height, distance=min_distance)
+                is_peak[row] = False
+                is_peak[row, kept] = True
+        is_peak &= magnitudes > threshold_db
+        
+        return np.nonzero(is_peak)
+    
     def calculate_spectral_features(self, magnitudes: np.ndarray) -> Dict[str, float]:
         """Calculate various spectral features for signal characterization"""
-        return {
-            'peak_magnitude': np.max(magnitudes),
-            'mean_magnitude': np.mean(magnitudes),
-            'std_magnitude': np.std(magnitudes),
-            'spectral_centroid': np.sum(magnitudes * np.arange(len(magnitudes))) / np.sum(magnitudes),
-            'spectral_rolloff': self._spectral_rolloff(magnitudes, 0.85),
-            'spectral_flatness': self._spectral_flatness(magnitudes)
-        }
+        features = self.spectral_feature_kernel(magnitudes)
+        return {name: float(features[name]) for name in FEATURE_DTYPE.names}
     
-    def _spectral_rolloff(self, magnitudes: np.ndarray, rolloff_percent: float = 0.85) -> float:
-        """Calculate spectral rolloff frequency"""
-        cumulative_sum = np.cumsum(magnitudes)
-        rolloff_threshold = rolloff_percent * cumulative_sum[-1]
-        rolloff_idx = np.where(cumulative_sum >= rolloff_threshold)[0]
-        return rolloff_idx[0] if len(rolloff_idx) > 0 else len(magnitudes) - 1
-    
-    def _spectral_flatness(self, magnitudes: np.ndarray) -> float:
-        """Calculate spectral flatness (Wiener entropy)"""
-        # Convert back from dB to linear scale for calculation
-        linear_mag = 10 ** (magnitudes / 20)
-        geometric_mean = np.power(np.prod(linear_mag + 1e-10), 1.0 / len(linear_mag))
-        arithmetic_mean = np.mean(linear_mag)
-        return geometric_mean / (arithmetic_mean + 1e-10)
+    def calculate_spectral_features_batch(self, magnitudes: np.ndarray) -> np.ndarray:
+        """Spectral features for each row of a (chunks, bins) matrix as a FEATURE_DTYPE array"""
+        return self.spectral_feature_kernel(magnitudes)
+    
+    def spectral_feature_kernel(self, magnitudes: np.ndarray) -> np.ndarray:
+        """
+        Compute all spectral features of dB spectra in one fused float32 pass
+        Works on a 1-D spectrum or any (..., bins) batch such as a spectrogram.
+        Linear weights are taken relative to each spectrum's peak, so nothing
+        under- or overflows. Centroid and rolloff are bin indices weighted by
+        linear magnitude, and flatness is the geometric over arithmetic mean
+        of linear magnitude, with the geometric mean taken in the log domain.
+        Returns: FEATURE_DTYPE array shaped like magnitudes without the last axis
+        """
+        magnitudes = np.asarray(magnitudes, dtype=np.float32)
+        shape = magnitudes.shape[:-1]
+        bins = magnitudes.shape[-1]
+        spectra = magnitudes.reshape(-1, bins)
+        
+        peak = spectra.max(axis=-1)
+        relative = spectra - peak[:, np.newaxis]  # dB below peak, <= 0
+        mean_relative = relative.mean(axis=-1)
+        variance = np.maximum(np.einsum('ij,ij->i', relative, relative) / bins - mean_relative ** 2, 0)
+        
+        weights = np.exp(relative * np.float32(np.log(10) / 20))  # Linear magnitude in (0, 1]
+        total = weights.sum(axis=-1)
+        cumulative = np.cumsum(weights, axis=-1)
+        
+        features = np.empty(len(spectra), dtype=FEATURE_DTYPE)
+        features['peak_magnitude'] = peak
+        features['mean_magnitude'] = peak + mean_relative
+        features['std_magnitude'] = np.sqrt(variance)
+        features['spectral_centroid'] = weights @ np.arange(bins, dtype=np.float32) / total
+        features['spectral_rolloff'] = np.argmax(cumulative >= 0.85 * cumulative[:, -1:], axis=-1)
+        features['spectral_flatness'] = np.exp(mean_relative * np.float32(np.log(10) / 20)) / (total / bins)
+        
+        return features.reshape(shape)
+
+class NoiseFloorEstimator:
+    """Streaming per-bin noise floor for dB spectra
+
+    Each bin follows an exponential average of its dB level, which settles
+    about 2.5 dB below the mean noise power. Upward steps are clipped to
+    max_rise_db so beacons and transients barely lift the floor, while
+    quieter background is followed at the full rate. One update is O(bins)
+    and keeps no history.
+    """
+    
+    def __init__(self, hop_sec: float, time_constant_sec: float = 5.0, max_rise_db: float = 6.0):
+        self.hop_sec = hop_sec
+        self.time_constant_sec = time_constant_sec
+        self.max_rise_db = max_rise_db
+        self.floor = None
+    
+    def update(self, magnitudes: np.ndarray, elapsed_sec: float = None) -> np.ndarray:
+        """Fold one spectrum into the floor (elapsed_sec defaults to one hop)"""
+        if self.floor is None or self.floor.shape != magnitudes.shape:
+            # Seed every bin with the band average so single-frame noise
+            # does not leave holes in the initial floor
+            self.floor = np.full(magnitudes.shape, np.mean(magnitudes), dtype=np.float32)
+            return self.floor
+        
+        if elapsed_sec is None:
+            elapsed_sec = self.hop_sec
+        rate = np.float32(1 - np.exp(-elapsed_sec / self.time_constant_sec))
+        
+        self.floor += rate * np.minimum(magnitudes - self.floor, self.max_rise_db)
+        return self.floor
+    
+    def reset(self):
+        """Forget the tracked floor"""
+        self.floor = None
+
+class PeriodicityDetector:
+    """Dominant repetition period of the per-hop band-energy envelope
+
+    Envelope values go into a fixed ring; every update_sec the ring is
+    unrolled and its autocorrelation computed with one zero-padded FFT.
+    The strongest local maximum of the normalized autocorrelation between
+    min_period_sec and max_period_sec, past its first dip, is reported with
+    its correlation as strength; envelopes whose autocorrelation only decays
+    (steps, drift) report no period. Between recomputations an
+    update is a ring write, so the cost stays low at any hop rate.
+    """
+    
+    def __init__(self, hop_sec: float, window_sec: float = 30.0, min_period_sec: float = 0.2,
+                 max_period_sec: float = 10.0, update_sec: float = 1.0):
+        self.hop_sec = hop_sec
+        self.size = max(4, int(round(window_sec / hop_sec)))
+        self.min_lag = max(1, int(round(min_period_sec / hop_sec)))
+        self.max_lag = int(round(max_period_sec / hop_sec))
+        self.update_hops = max(1, int(round(update_sec / hop_sec)))
+        
+        self._ring = np.zeros(self.size, dtype=np.float64)
+        self._pos = 0
+        self._count = 0
+        self._since_update = 0
+        self.period = None
+        self.strength = 0.0
+    
+    @staticmethod
+    def band_energy(spectrogram_db: np.ndarray) -> np.ndarray:
+        """Mean band power in dB for each row of a dB spectrogram"""
+        return 10 * np.log10(np.mean(10 ** (spectrogram_db / 10), axis=-1) + 1e-20)
+    
+    def update(self, energies: np.ndarray) -> Tuple[float, float]:
+        """
+        Append envelope values (one per hop)
+        Returns: (period_sec or None, strength) as of the latest recomputation
+        """
+        for start in range(0, len(energies), self.size):
+            piece = energies[start:start + self.size]
+            first = min(len(piece), self.size - self._pos)
+            self._ring[self._pos:self._pos + first] = piece[:first]
+            self._ring[:len(piece) - first] = piece[first:]
+            self._pos = (self._pos + len(piece)) % self.size
+        self._count = min(self._count + len(energies), self.size)
+        
+        self._since_update += len(energies)
+        if self._since_update >= self.update_hops:
+            self._since_update = 0
+            self._recompute()
+        
+        return self.period, self.strength
+    
+    def _recompute(self):
+        """Autocorrelate the envelope window and pick the dominant lag"""
+        # Need at least three repetitions of a candidate period in view
+        max_lag = min(self.max_lag, self._count // 3)
+        if max_lag <= self.min_lag:
+            self.period, self.strength = None, 0.0
+            return
+        
+        envelope = np.roll(self._ring, -self._pos)[self.size - self._count:]
+        envelope = envelope - envelope.mean()
+        n = len(envelope)
+        spectrum = np.fft.rfft(envelope, 2 * n)
+        acf = np.fft.irfft(spectrum.real ** 2 + spectrum.imag ** 2, 2 * n)[:max_lag + 1]
+        if acf[0] <= 0:
+            self.period, self.strength = None, 0.0
+            return
+        
+        # Unbiased normalization so longer lags are not penalized for overlap
+        lags = np.arange(max_lag + 1)
+        normalized = (acf / (n - lags)) / (acf[0] / n)
+        
+        # The central lobe falls off from lag 0 for any envelope; a period
+        # only shows as a rise after its first zero crossing or dip
+        falling = np.diff(normalized) < 0
+        first_dip = int(np.argmin(falling)) if not falling.all() else max_lag
+        crossing = np.flatnonzero(normalized <= 0)
+        start = min(first_dip, int(crossing[0]) if len(crossing) else max_lag)
+        
+        # Interior local maxima only, so no boundary lag can win
+        peaks = np.flatnonzero((normalized[1:-1] > normalized[:-2]) & (normalized[1:-1] >= normalized[2:])) + 1
+        peaks = peaks[(peaks > max(start, self.min_lag)) & (peaks < max_lag)]
+        if len(peaks) == 0:
+            self.period, self.strength = None, 0.0
+            return
+        
+        # Multiples of the true period correlate about as well, or better when
+        # the period is not a whole number of hops; take the first peak that
+        # comes close to the best
+        heights = normalized[peaks]
+        best = peaks[int(np.argmax(heights >= 0.8 * heights.max()))]
+        self.period = float(best * self.hop_sec)
+        self.strength = float(normalized[best])
+    
+    def reset(self):
+        self._pos = self._count = self._since_update = 0
+        self.period, self.strength = None, 0.0
+
+class FSKStream:
+    """Demodulation state of one emitter's sub-band"""
+    
+    def __init__(self, stream_id: int, center: float, lo: int, hi: int, timestamp: float):
+        self.stream_id = stream_id
+        self.center = center
+        self.lo = lo
+        self.hi = hi
+        self.tones = []  # Distinct symbol frequencies seen, ascending
+        self.run_freq = 0.0
+        self.run_hops = 0
+        self.min_run = 0
+        self.pending = []  # Symbol frequencies waiting for a two-tone alphabet
+        self.bits = []
+        self.last_active = timestamp
+
+class FSKDemodulator:
+    """Incremental FSK demodulation from consecutive band spectra
+
+    Each emitter frequency passed in as a seed gets a sub-band of span_hz. Per hop the strongest
+    bin in that sub-band is taken as the current tone if it clears the noise
+    floor; consecutive hops on the same tone form a run, and a run of length
+    L contributes round(L / symbol_hops) symbols. Without a configured symbol
+    duration, one symbol is taken as half a hop longer than the shortest run
+    seen so far (runs of one symbol are floor or ceil of its length). Runs
+    shorter than min_run_hops are frames straddling a tone change and are
+    dropped. Binary symbols decode as
+    0 below and 1 above the midpoint of the tones seen, and are emitted as
+    soon as their run ends, so state carries over between chunks.
+    """
+    
+    def __init__(self, hop_sec: float, span_hz: float = 1000.0, symbol_sec: float = 0.0,
+                 tone_tolerance_hz: float = 30.0, min_run_hops: int = 2, threshold_db: float = -40.0,
+                 min_snr_db: float = 15.0, release_sec: float = 5.0, max_bits: int = 1024):
+        self.hop_sec = hop_sec
+        self.span_hz = span_hz
+        self.symbol_hops = symbol_sec / hop_sec if symbol_sec > 0 else 0.0
+        self.tone_tolerance_hz = tone_tolerance_hz
+        self.min_run_hops = min_run_hops
+        self.threshold_db = threshold_db
+        self.min_snr_db = min_snr_db
+        self.release_sec = release_sec
+        self.max_bits = max_bits
+        
+        self.streams = {}
+        self._next_id = 1
+    
+    def _stream_for(self, frequency: float) -> FSKStream:
+        for stream in self.streams.values():
+            if abs(stream.center - frequency) <= self.span_hz / 2:
+                return stream
+        return None
+    
+    def _close_run(self, stream: FSKStream) -> List[str]:
+        """Turn the finished tone run into symbols and any decodable bits"""
+        run_hops, stream.run_hops = stream.run_hops, 0
+        if run_hops < self.min_run_hops:
+            return []
+        
+        if not self.symbol_hops:
+            stream.min_run = min(stream.min_run or run_hops, run_hops)
+        symbol_hops = self.symbol_hops or stream.min_run + 0.5
+        count = max(1, int(round(run_hops / symbol_hops)))
+        
+        frequency = stream.run_freq
+        if all(abs(tone - frequency) > self.tone_tolerance_hz for tone in stream.tones):
+            bisect.insort(stream.tones, frequency)
+        stream.pending.extend([frequency] * count)
+        
+        if len(stream.tones) < 2:
+            return []
+        midpoint = (stream.tones[0] + stream.tones[-1]) / 2
+        bits = ['1' if f > midpoint else '0' for f in stream.pending]
+        stream.pending.clear()
+        stream.bits.extend(bits)
+        del stream.bits[:-self.max_bits]
+        return bits
+    
+    def update(self, frequencies: np.ndarray, spectrogram: np.ndarray, seeds: List[float],
+               noise_floor: np.ndarray = None, now: float = None) -> Dict[int, str]:
+        """
+        Feed one chunk of band spectra (rows are consecutive hops)
+        seeds are emitter frequencies; any not covered by a stream opens one.
+        Returns: {stream_id: newly decoded bits} for streams that produced any
+        """
+        if now is None:
+            now = time.time()
+        
+        for frequency in seeds:
+            if self._stream_for(frequency) is None:
+                lo, hi = np.searchsorted(frequencies, [frequency - self.span_hz / 2, frequency + self.span_hz / 2])
+                if hi > lo:
+                    self.streams[self._next_id] = FSKStream(self._next_id, frequency, int(lo), int(hi), now)
+                    self._next_id += 1
+        
+        decoded = {}
+        rows = np.arange(len(spectrogram))
+        for stream in list(self.streams.values()):
+            block = spectrogram[:, stream.lo:stream.hi]
+            strongest = np.argmax(block, axis=1)
+            level = block[rows, strongest]
+            present = level > self.threshold_db
+            if noise_floor is not None:
+                present &= level - noise_floor[stream.lo + strongest] >= self.min_snr_db
+            tone_freqs = frequencies[stream.lo + strongest]
+            
+            bits = []
+            for is_present, frequency in zip(present.tolist(), tone_freqs.tolist()):
+                if is_present and stream.run_hops and abs(frequency - stream.run_freq) <= self.tone_tolerance_hz:
+                    stream.run_freq += (frequency - stream.run_freq) / (stream.run_hops + 1)
+                    stream.run_hops += 1
+                    continue
+                bits.extend(self._close_run(stream))
+                if is_present:
+                    stream.run_freq = frequency
+                    stream.run_hops = 1
+            if present.any():
+                stream.last_active = now
+            
+            if now - stream.last_active > self.release_sec:
+                del self.streams[stream.stream_id]
+            if bits:
+                decoded[stream.stream_id] = ''.join(bits)
+        
+        return decoded
+    
+    def summary(self) -> List[Dict[str, Any]]:
+        """Per-stream tones and decoded bits for display"""
+        return [{
+            'stream_id': stream.stream_id,
+            'center': float(stream.center),
+            'tones': [float(tone) for tone in stream.tones],
+            'bits': ''.join(stream.bits[-64:])
+        } for stream in self.streams.values()]
+
+class ToneTracker:
+    """Per-sample envelopes of known tone frequencies via a sliding DFT
+
+    Each tracked tone keeps a running sum of x[m] * e^(-jwm); the DFT bin over
+    the last window_size samples is the difference of that sum across the
+    window, so its magnitude is available at every sample. The sums live in a
+    window_size ring, making an update O(samples * tones) with no rescans.
+    """
+    
+    def __init__(self, sample_rate: int = 44100, window_size: int = 4096,
+                 threshold_db: float = -40.0, release_sec: float = 30.0):
+        self.sample_rate = sample_rate
+        self.window_size = window_size
+        self.threshold_db = threshold_db
+        self.release_samples = int(release_sec * sample_rate)
+        
+        self.frequencies = np.zeros(0)
+        self._omega = np.zeros(0)
+        self._phasors = np.zeros((window_size, 0), dtype=np.complex128)
+        self._phase = np.zeros(0)
+        self._running = np.zeros(0, dtype=np.complex128)
+        self._ring = np.zeros((window_size, 0), dtype=np.complex128)
+        self._ring_pos = 0
+        self._silent_samples = np.zeros(0, dtype=np.int64)
+    
+    def track(self, frequency: float, tolerance_hz: float = 0.0) -> bool:
+        """Start tracking a tone unless one is already tracked within a bin (or tolerance_hz)"""
+        tolerance_hz = max(tolerance_hz, self.sample_rate / self.window_size)
+        if np.any(np.abs(self.frequencies - frequency) <= tolerance_hz):
+            return False
+        
+        self.frequencies = np.append(self.frequencies, frequency)
+        self._update_phasors()
+        self._phase = np.append(self._phase, 0.0)
+        self._running = np.append(self._running, 0)
+        self._ring = np.concatenate((self._ring, np.zeros((self.window_size, 1), dtype=np.complex128)), axis=1)
+        self._silent_samples = np.append(self._silent_samples, 0)
+        return True
+    
+    def untrack(self, index: int):
+        """Stop tracking the tone at the given index"""
+        keep = np.arange(len(self.frequencies)) != index
+        self.frequencies = self.frequencies[keep]
+        self._update_phasors()
+        self._phase = self._phase[keep]
+        self._running = self._running[keep]
+        self._ring = np.ascontiguousarray(self._ring[:, keep])
+        self._silent_samples = self._silent_samples[keep]
+    
+    def retain(self, frequencies: List[float], tolerance_hz: float):
+        """Stop tracking every tone with no given frequency within tolerance_hz"""
+        frequencies = np.asarray(frequencies, dtype=np.float64)
+        for index in range(len(self.frequencies) - 1, -1, -1):
+            if not np.any(np.abs(frequencies - self.frequencies[index]) <= tolerance_hz):
+                self.untrack(index)
+    
+    def _update_phasors(self):
+        """Precompute e^(-jwi) for one window of samples per tracked tone"""
+        self._omega = 2 * np.pi * self.frequencies / self.sample_rate
+        self._phasors = np.exp(-1j * np.outer(np.arange(self.window_size), self._omega))
+    
+    def update(self, audio_data: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Feed new samples and return the tone envelopes
+        Envelopes are in dB on the same scale as SignalProcessor.compute_fft
+        with a Hann window, one value per sample and tone.
+        Returns: (frequencies, envelopes) with envelopes shaped (samples, tones)
+        """
+        frequencies = self.frequencies
+        envelopes = np.empty((len(audio_data), len(frequencies)), dtype=np.float32)
+        if len(frequencies) == 0:
+            return frequencies, envelopes
+        
+        for start in range(0, len(audio_data), self.window_size):
+            piece = audio_data[start:start + self.window_size]
+            count = len(piece)
+            
+            rotation = self._phasors[:count] * np.exp(-1j * self._phase)
+            sums = np.cumsum(piece[:, np.newaxis] * rotation, axis=0) + self._running
+            self._running = sums[-1]
+            self._phase = (self._phase + self._omega * count) % (2 * np.pi)
+            
+            # The ring holds running sums from window_size samples ago at the
+            # positions the new sums replace (in at most two runs)
+            first = min(count, self.window_size - self._ring_pos)
+            window_sums = np.empty_like(sums)
+            window_sums[:first] = sums[:first] - self._ring[self._ring_pos:self._ring_pos + first]
+            window_sums[first:] = sums[first:] - self._ring[:count - first]
+            self._ring[self._ring_pos:self._ring_pos + first] = sums[:first]
+            self._ring[:count - first] = sums[first:]
+            self._ring_pos = (self._ring_pos + count) % self.window_size
+            
+            # A rectangular window has twice the coherent gain of Hann
+            envelopes[start:start + count] = 20 * np.log10(np.abs(window_sums) / 2 + 1e-10)
+        
+        # Release tones that stayed below threshold for release_sec
+        active = np.any(envelopes > self.threshold_db, axis=0)
+        self._silent_samples = np.where(active, 0, self._silent_samples + len(audio_data))
+        for index in np.flatnonzero(self._silent_samples >= self.release_samples)[::-1]:
+            self.untrack(index)
+        
+        return frequencies, envelopes
 
 class DetectionLogger:
-    """Handles logging of ultrasonic signal detections"""
+    """Handles logging of ultrasonic signal detections
+
+    Detection records are queued without blocking and written by a
+    background thread. Lines collect in a MemoryHandler that writes to the
+    log file every batch_size records or flush_interval_sec, whichever comes
+    first. When the queue is full, records are dropped and counted in
+    dropped. With jsonl_file set, every record is also appended there as one
+    JSON object per line, flushed on the same schedule.
+    """
     
-    def __init__(self, log_file: str = "silenttrace_detections.log"):
+    def __init__(self, log_file: str = "silenttrace_detections.log", queue_size: int = 10000,
+                 batch_size: int = 100, flush_interval_sec: float = 1.0, jsonl_file: str = None):
         self.log_file = log_file
+        self.jsonl_file = jsonl_file
+        self._jsonl = open(jsonl_file, 'a', buffering=1 << 16) if jsonl_file else None
+        self.batch_size = batch_size
+        self.flush_interval_sec = flush_interval_sec
+        self.dropped = 0
         self.setup_logging()
         
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._writer = threading.Thread(target=self._write_loop, name="DetectionLogger", daemon=True)
+        self._writer.start()
+        
     def setup_logging(self):
         """Setup logging configuration"""
         logging.basicConfig(
@@ -120,14 +656,64 @@ class DetectionLogger:
             ]
         )
         self.logger = logging.getLogger('SilentTrace')
+        
+        # Detections bypass the console and reach the file in batches
+        file_handler = logging.FileHandler(self.log_file)
+        file_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+        self._batch_handler = logging.handlers.MemoryHandler(
+            self.batch_size, flushLevel=logging.CRITICAL, target=file_handler
+        )
+        self.detection_logger = logging.getLogger('SilentTrace.detections')
+        self.detection_logger.propagate = False
+        for handler in list(self.detection_logger.handlers):
+            self.detection_logger.removeHandler(handler)
+        self.detection_logger.addHandler(self._batch_handler)
     
     def log_detection(self, detection_data: Dict[str, Any]):
-        """Log a detection event"""
-        timestamp = datetime.now().isoformat()
-        detection_data['timestamp'] = timestamp
+        """Queue a detection event for the writer thread (never blocks)"""
+        try:
+            self._queue.put_nowait((time.time(), detection_data))
+        except queue.Full:
+            self.dropped += 1
+    
+    def _write_loop(self):
+        """Serialize queued detections until the close sentinel arrives"""
+        last_flush = time.monotonic()
+        pending = 0
+        while True:
+            try:
+                item = self._queue.get(timeout=self.flush_interval_sec)
+            except queue.Empty:
+                item = ()
+            if item is None:
+                break
+            
+            if item:
+                timestamp, detection_data = item
+                detection_data['timestamp'] = datetime.fromtimestamp(timestamp).isoformat()
+                message = json.dumps(detection_data, separators=(',', ':'), default=float)
+                self.detection_logger.warning(f"ULTRASONIC DETECTION: {message}")
+                if self._jsonl is not None:
+                    self._jsonl.write(message + '\n')
+                    pending += 1
+            
+            # The handler flushes itself at batch_size; this covers quiet periods
+            if pending >= self.batch_size or time.monotonic() - last_flush >= self.flush_interval_sec:
+                self._batch_handler.flush()
+                if self._jsonl is not None:
+                    self._jsonl.flush()
+                pending = 0
+                last_flush = time.monotonic()
         
-        log_message = f"ULTRASONIC DETECTION: {json.dumps(detection_data, indent=2)}"
-        self.logger.warning(log_message)
+        self._batch_handler.flush()
+        if self._jsonl is not None:
+            self._jsonl.close()
+    
+    def close(self, timeout: float = 5.0):
+        """Write out queued detections and stop the writer thread"""
+        if self._writer.is_alive():
+            self._queue.put(None)
+            self._writer.join(timeout)
     
     def log_info(self, message: str):
         """Log general information"""
@@ -137,6 +723,33 @@ class DetectionLogger:
         """Log error messages"""
         self.logger.error(message)
 
+def iter_detection_log(path: str, event_type: str = None) -> Iterator[Dict[str, Any]]:
+    """
+    Lazily yield detection records from a log file
+    Reads JSON Lines files and the single-line "ULTRASONIC DETECTION: {...}"
+    entries of the human log alike, one line at a time, so memory stays
+    bounded for any file size. Lines that are not detection records are
+    skipped; event_type keeps only records of that type.
+    """
+    marker = "ULTRASONIC DETECTION: "
+    with open(path, 'r') as f:
+        for line in f:
+            if line.startswith('{'):
+                payload = line
+            else:
+                start = line.find(marker)
+                if start < 0:
+                    continue
+                payload = line[start + len(marker):]
+            
+            try:
+                record = json.loads(payload)
+            except ValueError:
+                continue  # Truncated tail or a pre-JSONL multi-line entry
+            
+            if event_type is None or record.get('type') == event_type:
+                yield record
+
 class CLIDisplay:
     """Enhanced CLI display with colors and formatting"""
     
@@ -208,6 +821,251 @@ class CLIDisplay:
         )
         console.print(stats_text)
 
+class SlidingWindowStats:
+    """Count, mean and spread of values inside a trailing time window
+
+    Entries arrive in time order and expire from the left, and running sums
+    are adjusted on every push and eviction, so each query is O(1) and each
+    entry is touched twice regardless of the window length.
+    """
+    
+    def __init__(self, window_sec: float):
+        self.window_sec = window_sec
+        self._entries = deque()
+        self._shift = 0.0  # Sums are kept relative to this to avoid cancellation
+        self._sum = 0.0
+        self._sum_sq = 0.0
+    
+    def push(self, timestamp: float, value: float):
+        """Append a value observed at timestamp"""
+        if not self._entries:
+            self._shift = float(value)
+        delta = float(value) - self._shift
+        self._entries.append((timestamp, delta))
+        self._sum += delta
+        self._sum_sq += delta * delta
+    
+    def extend(self, timestamps: np.ndarray, values: np.ndarray):
+        """Append several values in time order"""
+        for timestamp, value in zip(timestamps.tolist(), values.tolist()):
+            self.push(timestamp, value)
+    
+    def evict(self, now: float = None):
+        """Drop entries older than the window"""
+        if now is None:
+            now = time.time()
+        cutoff = now - self.window_sec
+        entries = self._entries
+        while entries and entries[0][0] < cutoff:
+            _, delta = entries.popleft()
+            self._sum -= delta
+            self._sum_sq -= delta * delta
+        if not entries:
+            self._sum = self._sum_sq = 0.0
+    
+    @property
+    def count(self) -> int:
+        return len(self._entries)
+    
+    def mean(self) -> float:
+        if not self._entries:
+            return 0.0
+        return self._shift + self._sum / len(self._entries)
+    
+    def std(self) -> float:
+        """Population standard deviation, as np.std"""
+        n = len(self._entries)
+        if n == 0:
+            return 0.0
+        mean_delta = self._sum / n
+        return float(np.sqrt(max(self._sum_sq / n - mean_delta * mean_delta, 0.0)))
+    
+    def clear(self):
+        self._entries.clear()
+        self._sum = self._sum_sq = 0.0
+
+class BeaconTrack:
+    """One emitter followed by BeaconTracker
+
+    Detections closer together than burst_gap_sec form one burst; the period
+    is an exponential average of the spacing between burst onsets, and
+    repetitions count the onsets inside the window (a single tone spans
+    several hops but is one burst).
+    """
+    
+    def __init__(self, track_id: int, frequency: float, timestamp: float, window_sec: float):
+        self.track_id = track_id
+        self.frequency = frequency
+        self.first_seen = timestamp
+        self.last_seen = timestamp
+        self.window_sec = window_sec
+        self.hits = SlidingWindowStats(window_sec)
+        self.hits.push(timestamp, frequency)
+        self.bursts = deque([timestamp])  # Onsets inside the window
+        self.burst_start = timestamp
+        self.intervals = 0
+        self.period_mean = 0.0
+        self.period_var = 0.0
+    
+    def add(self, timestamp: float, frequency: float, burst_gap_sec: float, smoothing: float = 0.25):
+        """Fold one associated detection into the track"""
+        if timestamp - self.last_seen > burst_gap_sec:
+            interval = timestamp - self.burst_start
+            if self.intervals == 0:
+                self.period_mean = interval
+            else:
+                diff = interval - self.period_mean
+                self.period_mean += smoothing * diff
+                self.period_var = (1 - smoothing) * (self.period_var + smoothing * diff * diff)
+            self.intervals += 1
+            self.burst_start = timestamp
+            self.bursts.append(timestamp)
+        
+        self.hits.push(timestamp, frequency)
+        self.last_seen = timestamp
+        self.frequency = self.hits.mean()
+    
+    def evict(self, now: float):
+        """Drop hits and burst onsets older than the window"""
+        self.hits.evict(now)
+        cutoff = now - self.window_sec
+        while self.bursts and self.bursts[0] < cutoff:
+            self.bursts.popleft()
+    
+    @property
+    def repetitions(self) -> int:
+        """Burst onsets inside the repetition window"""
+        return len(self.bursts)
+    
+    @property
+    def period(self) -> float:
+        """Average burst repetition period in seconds, or None before two bursts"""
+        return self.period_mean if self.intervals else None
+    
+    def confidence(self, repetition_threshold: int) -> float:
+        """0..1 score from repetition count and period regularity"""
+        regularity = 0.0
+        if self.intervals >= 2 and self.period_mean > 0:
+            regularity = 1 / (1 + np.sqrt(self.period_var) / self.period_mean)
+        return min(1.0, self.repetitions / repetition_threshold) * (0.5 + 0.5 * regularity)
+
+class BeaconTracker:
+    """Frequency-indexed set of live beacon tracks
+
+    Track frequencies are kept sorted so each detection finds its nearest
+    track by bisection in O(log tracks); detections with no track within
+    tolerance_hz start a new one. Tracks idle for release_sec are dropped;
+    tick() must run every hop, detections or not, for that to happen.
+    """
+    
+    def __init__(self, tolerance_hz: float = 100.0, window_sec: float = 10.0,
+                 repetition_threshold: int = 3, burst_gap_sec: float = 0.25,
+                 release_sec: float = 60.0):
+        self.tolerance_hz = tolerance_hz
+        self.window_sec = window_sec
+        self.repetition_threshold = repetition_threshold
+        self.burst_gap_sec = burst_gap_sec
+        self.release_sec = release_sec
+        
+        self._frequencies = []  # Sorted, parallel to _tracks
+        self._tracks = []
+        self._next_id = 1
+        self._last_prune = 0.0
+    
+    def __len__(self) -> int:
+        return len(self._tracks)
+    
+    def _nearest(self, frequency: float) -> int:
+        """Index of the closest track within tolerance, or -1"""
+        index = bisect.bisect_left(self._frequencies, frequency)
+        best, best_dist = -1, self.tolerance_hz
+        for candidate in (index - 1, index):
+            if 0 <= candidate < len(self._frequencies):
+                dist = abs(self._frequencies[candidate] - frequency)
+                if dist <= best_dist:
+                    best, best_dist = candidate, dist
+        return best
+    
+    def _insert(self, track: BeaconTrack):
+        index = bisect.bisect_left(self._frequencies, track.frequency)
+        self._frequencies.insert(index, track.frequency)
+        self._tracks.insert(index, track)
+    
+    def update(self, detections: np.ndarray, now: float = None) -> List[BeaconTrack]:
+        """
+        Associate detection records with tracks
+        Returns: the tracks touched by these detections
+        """
+        if now is None:
+            now = time.time()
+        
+        touched = {}
+        for timestamp, frequency in zip(detections['timestamp'].tolist(), detections['frequency'].tolist()):
+            index = self._nearest(frequency)
+            if index < 0:
+                track = BeaconTrack(self._next_id, frequency, timestamp, self.window_sec)
+                self._next_id += 1
+                self._insert(track)
+            else:
+                track = self._tracks[index]
+                track.add(timestamp, frequency, self.burst_gap_sec)
+                # Re-sort only if the averaged frequency passed a neighbour
+                if ((index > 0 and track.frequency < self._frequencies[index - 1]) or
+                        (index + 1 < len(self._tracks) and track.frequency > self._frequencies[index + 1])):
+                    del self._frequencies[index], self._tracks[index]
+                    self._insert(track)
+                else:
+                    self._frequencies[index] = track.frequency
+            touched[track.track_id] = track
+        
+        for track in touched.values():
+            track.evict(now)
+        self.tick(now)
+        
+        return list(touched.values())
+    
+    def tick(self, now: float = None):
+        """Expire old hits and drop idle tracks; cheap unless a second has passed"""
+        if now is None:
+            now = time.time()
+        
+        # A full pass over the tracks, so at most once a second
+        if now - self._last_prune < 1.0:
+            return
+        self._last_prune = now
+        for track in self._tracks:
+            track.evict(now)
+        keep = [i for i, track in enumerate(self._tracks) if now - track.last_seen <= self.release_sec]
+        if len(keep) < len(self._tracks):
+            self._frequencies = [self._frequencies[i] for i in keep]
+            self._tracks = [self._tracks[i] for i in keep]
+    
+    def tracks(self) -> List[BeaconTrack]:
+        """Live tracks in ascending frequency order"""
+        return list(self._tracks)
+    
+    def summary(self, now: float = None) -> List[Dict[str, Any]]:
+        """Per-track repetition, period and confidence for display"""
+        if now is None:
+            now = time.time()
+        
+        summary = []
+        for track in self._tracks:
+            track.evict(now)
+            summary.append({
+                'track_id': track.track_id,
+                'frequency': float(track.frequency),
+                'repetitions': track.repetitions,
+                'period': track.period,
+                'confidence': float(track.confidence(self.repetition_threshold)),
+                'last_seen': track.last_seen
+            })
+        return summary
+    
+    def clear(self):
+        self._frequencies.clear()
+        self._tracks.clear()
+
 class DataBuffer:
     """Circular buffer for storing historical data"""
     
@@ -253,6 +1111,358 @@ class DataBuffer:
         """Get current buffer size"""
         return len(self.data)
 
+THREAT_LEVELS = ("normal", "warning", "alert")
+
+class SpectrumQuantizer:
+    """uint8 codes for dB spectra on the SignalProcessor.compute_fft scale
+
+    With the Hann window a full-scale tone peaks near +60 dB and a -40 dBFS
+    tone near +20 dB, so the default range of -120..+64 dB covers silence
+    to full scale in 255 steps of about 0.72 dB.
+    """
+    
+    def __init__(self, min_db: float = -120.0, max_db: float = 64.0):
+        self.min_db = min_db
+        self.max_db = max_db
+        self.step_db = (max_db - min_db) / 255
+    
+    def encode(self, spectrum: np.ndarray) -> np.ndarray:
+        """Nearest codes, clipped to the range"""
+        return np.clip(np.rint((spectrum - self.min_db) / self.step_db), 0, 255).astype(np.uint8)
+    
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        return codes.astype(np.float32) * self.step_db + self.min_db
+
+SPECTRUM_QUANTIZER = SpectrumQuantizer()
+
+class SpectrumHistory:
+    """Compact per-hop history of band spectra, features and detections
+
+    The band frequency axis is stored once. Each hop keeps its band
+    magnitudes as SpectrumQuantizer codes in a preallocated ring, next to
+    its timestamp, chunk number, threat level code and FEATURE_DTYPE
+    features. Detections go to their own DETECTION_DTYPE ring and are joined
+    back by chunk number.
+
+    Both rings write every entry to slot i and its mirror i + size, so the
+    newest size entries are always one contiguous slice, and timestamps are
+    clamped to be non-decreasing. Adding is O(1) and a time-range query
+    bisects the slice in O(log n), copying out only the entries it returns.
+    """
+    
+    def __init__(self, max_size: int = 1000, max_detections: int = None,
+                 quantizer: SpectrumQuantizer = SPECTRUM_QUANTIZER):
+        self.max_size = max_size
+        self.quantizer = quantizer
+        self.frequencies = None
+        self._levels = None
+        self._timestamps = np.zeros(2 * max_size, dtype=np.float64)
+        self._chunks = np.zeros(2 * max_size, dtype=np.int64)
+        self._threat = np.zeros(2 * max_size, dtype=np.uint8)
+        self._features = np.zeros(2 * max_size, dtype=FEATURE_DTYPE)
+        self._head = 0  # Next slot to write, in [0, max_size)
+        self._count = 0
+        
+        self.max_detections = max_detections or 10 * max_size
+        self._detections = np.zeros(2 * self.max_detections, dtype=DETECTION_DTYPE)
+        self._det_head = 0
+        self._det_count = 0
+    
+    def add(self, frequencies: np.ndarray, magnitudes: np.ndarray, features: Dict[str, float],
+            threat_level: str, detections: np.ndarray, chunk: int, timestamp: float = None):
+        """Append one hop; the spectrum is quantized into the ring in place"""
+        if timestamp is None:
+            timestamp = time.time()
+        if self._levels is None or self._levels.shape[1] != len(magnitudes):
+            # First hop, or the band layout changed: start over
+            self.frequencies = np.array(frequencies, dtype=np.float32)
+            self._levels = np.zeros((2 * self.max_size, len(magnitudes)), dtype=np.uint8)
+            self._head = self._count = 0
+        if self._count:
+            # Clamp clock steps backwards so the timestamps stay sorted
+            timestamp = max(timestamp, self._timestamps[self._head - 1 + self.max_size])
+        
+        slot = self._head
+        mirror = slot + self.max_size
+        self._levels[slot] = self._levels[mirror] = self.quantizer.encode(magnitudes)
+        self._timestamps[slot] = self._timestamps[mirror] = timestamp
+        self._chunks[slot] = self._chunks[mirror] = chunk
+        self._threat[slot] = self._threat[mirror] = THREAT_LEVELS.index(threat_level)
+        for name in FEATURE_DTYPE.names:
+            self._features[slot][name] = self._features[mirror][name] = features[name]
+        self._head = (slot + 1) % self.max_size
+        self._count = min(self._count + 1, self.max_size)
+        
+        count = len(detections)
+        if count:
+            if count > self.max_detections:
+                detections = detections[-self.max_detections:]
+                count = self.max_detections
+            detections = detections.copy()
+            if self._det_count:
+                np.maximum(detections['timestamp'], self._detections['timestamp'][self._det_head - 1 + self.max_detections],
+                           out=detections['timestamp'])
+            np.maximum.accumulate(detections['timestamp'], out=detections['timestamp'])
+            
+            positions = (self._det_head + np.arange(count)) % self.max_detections
+            self._detections[positions] = detections
+            self._detections[positions + self.max_detections] = detections
+            self._det_head = (self._det_head + count) % self.max_detections
+            self._det_count = min(self._det_count + count, self.max_detections)
+    
+    def _window(self) -> Tuple[int, int]:
+        """Slice bounds of all stored hops, oldest first"""
+        end = self._head + self.max_size
+        return end - self._count, end
+    
+    def size(self) -> int:
+        return self._count
+    
+    def recent(self, seconds: float = 60.0, limit: int = None, chunks: np.ndarray = None) -> Dict[str, Any]:
+        """
+        Entries from the last N seconds (at most limit, newest kept)
+        With chunks, only entries of those chunk numbers plus the newest entry.
+        Returns: dict of timestamps, chunks, threat_levels, features and
+        dequantized magnitudes (entries, bins), oldest first, all copies
+        """
+        start, end = self._window()
+        start += int(np.searchsorted(self._timestamps[start:end], time.time() - seconds, side='left'))
+        if limit is not None:
+            start = max(start, end - limit)
+        selection = slice(start, end)
+        if chunks is not None and end > start:
+            selection = np.flatnonzero(np.isin(self._chunks[start:end], chunks)) + start
+            if len(selection) == 0 or selection[-1] != end - 1:
+                selection = np.append(selection, end - 1)
+        
+        magnitudes = (self.quantizer.decode(self._levels[selection])
+                      if self._levels is not None else np.zeros((0, 0), dtype=np.float32))
+        return {
+            'timestamps': self._timestamps[selection].copy(),
+            'chunks': self._chunks[selection].copy(),
+            'threat_levels': [THREAT_LEVELS[code] for code in self._threat[selection]],
+            'features': self._features[selection].copy(),
+            'magnitudes': magnitudes
+        }
+    
+    def detections(self, since: float = 0.0) -> np.ndarray:
+        """Copies of stored detection records with timestamp >= since, oldest first"""
+        end = self._det_head + self.max_detections
+        start = end - self._det_count
+        start += int(np.searchsorted(self._detections['timestamp'][start:end], since, side='left'))
+        return self._detections[start:end].copy()
+    
+    @property
+    def nbytes(self) -> int:
+        levels = self._levels.nbytes if self._levels is not None else 0
+        return (levels + self._timestamps.nbytes + self._chunks.nbytes + self._threat.nbytes +
+                self._features.nbytes + self._detections.nbytes)
+    
+    def clear(self):
+        self._head = self._count = 0
+        self._det_head = self._det_count = 0
+
+class RollupTier:
+    """Fixed-size ring of aggregates at one time resolution
+
+    The open bucket accumulates a spectrum sum and max, a hop count,
+    detection count, peak band energy and highest threat code. When a sample
+    for a later bucket arrives, the open bucket is written to the ring, with
+    spectra coded by the SpectrumQuantizer SpectrumHistory uses, and handed
+    to the next coarser tier.
+    """
+    
+    def __init__(self, resolution_sec: float, size: int, bins: int,
+                 quantizer: SpectrumQuantizer = SPECTRUM_QUANTIZER):
+        self.resolution_sec = resolution_sec
+        self.size = size
+        self.quantizer = quantizer
+        self.coarser = None
+        
+        self.times = np.zeros(size, dtype=np.float64)
+        self.counts = np.zeros(size, dtype=np.int32)
+        self.max_energy = np.zeros(size, dtype=np.float32)
+        self.threat = np.zeros(size, dtype=np.uint8)
+        self.spectrum_max = np.zeros((size, bins), dtype=np.uint8)
+        self.spectrum_mean = np.zeros((size, bins), dtype=np.uint8)
+        self._head = 0
+        self._count = 0
+        
+        self._bucket = None
+        self._sum = np.zeros(bins, dtype=np.float64)
+        self._max = np.full(bins, -np.inf, dtype=np.float32)
+        self._hops = 0
+        self._detections = 0
+        self._energy = -np.inf
+        self._threat = 0
+    
+    def add(self, timestamp: float, spectrum_sum: np.ndarray, spectrum_max: np.ndarray, hops: int,
+            detections: int, energy: float, threat: int):
+        """Fold aggregates of one hop (or a finer bucket) into the open bucket"""
+        bucket = int(timestamp // self.resolution_sec)
+        if bucket != self._bucket:
+            self._close()
+            self._bucket = bucket
+        
+        self._sum += spectrum_sum
+        np.maximum(self._max, spectrum_max, out=self._max)
+        self._hops += hops
+        self._detections += detections
+        self._energy = max(self._energy, energy)
+        self._threat = max(self._threat, threat)
+    
+    def _close(self):
+        """Write the open bucket to the ring and pass it on"""
+        if self._bucket is None or self._hops == 0:
+            return
+        
+        slot = self._head
+        start = self._bucket * self.resolution_sec
+        self.times[slot] = start
+        self.counts[slot] = self._detections
+        self.max_energy[slot] = self._energy
+        self.threat[slot] = self._threat
+        self.spectrum_max[slot] = self.quantizer.encode(self._max)
+        self.spectrum_mean[slot] = self.quantizer.encode(self._sum / self._hops)
+        self._head = (slot + 1) % self.size
+        self._count = min(self._count + 1, self.size)
+        
+        if self.coarser is not None:
+            self.coarser.add(start, self._sum, self._max, self._hops, self._detections, self._energy, self._threat)
+        
+        self._sum[:] = 0
+        self._max[:] = -np.inf
+        self._hops = self._detections = self._threat = 0
+        self._energy = -np.inf
+    
+    def series(self, start_time: float = 0.0, spectra: bool = False) -> Dict[str, Any]:
+        """
+        Closed buckets from start_time on, plus the open one, oldest first
+        Returns: dict of times, counts, max_energy, threat_levels and, with
+        spectra, dequantized spectrum_max and spectrum_mean (points, bins)
+        """
+        positions = (self._head - self._count + np.arange(self._count)) % self.size
+        positions = positions[self.times[positions] >= start_time]
+        
+        series = {
+            'times': self.times[positions].tolist(),
+            'counts': self.counts[positions].tolist(),
+            'max_energy': self.max_energy[positions].tolist(),
+            'threat_levels': [THREAT_LEVELS[code] for code in self.threat[positions]]
+        }
+        if spectra:
+            series['spectrum_max'] = self.quantizer.decode(self.spectrum_max[positions])
+            series['spectrum_mean'] = self.quantizer.decode(self.spectrum_mean[positions])
+        
+        # The bucket still filling is the newest point of every live view
+        if self._hops and self._bucket * self.resolution_sec >= start_time:
+            series['times'].append(self._bucket * self.resolution_sec)
+            series['counts'].append(self._detections)
+            series['max_energy'].append(float(self._energy))
+            series['threat_levels'].append(THREAT_LEVELS[self._threat])
+            if spectra:
+                series['spectrum_max'] = np.vstack((series['spectrum_max'], self._max))
+                series['spectrum_mean'] = np.vstack((series['spectrum_mean'], self._sum / self._hops))
+        return series
+
+class HistoryRollups:
+    """Detection and spectrum history at several resolutions
+
+    Hops feed only the finest tier; each closed bucket cascades into the
+    next coarser one, so adding a hop costs O(bins) and coarse tiers update
+    once per bucket. The default tiers keep 10 minutes at 1 s, 2 hours at
+    10 s, a day at 1 min and 30 days at 1 h.
+    """
+    
+    DEFAULT_TIERS = ((1, 600), (10, 720), (60, 1440), (3600, 720))
+    
+    def __init__(self, tiers: Tuple[Tuple[float, int], ...] = DEFAULT_TIERS):
+        self.tier_specs = tiers
+        self.tiers = []
+        self.bins = None
+    
+    def add(self, timestamp: float, magnitudes: np.ndarray, detections: int, energy: float, threat_level: str):
+        """Fold one hop's band spectrum and counters into the finest tier"""
+        if self.bins != len(magnitudes):
+            self.bins = len(magnitudes)
+            self.tiers = [RollupTier(resolution, size, self.bins) for resolution, size in self.tier_specs]
+            for finer, coarser in zip(self.tiers, self.tiers[1:]):
+                finer.coarser = coarser
+        
+        self.tiers[0].add(timestamp, magnitudes, magnitudes, 1, detections, energy,
+                          THREAT_LEVELS.index(threat_level))
+    
+    def tier_for(self, seconds: float, max_points: int = 600) -> RollupTier:
+        """Finest tier that covers the span in at most max_points buckets"""
+        for tier in self.tiers:
+            if seconds / tier.resolution_sec <= max_points:
+                return tier
+        return self.tiers[-1] if self.tiers else None
+    
+    def series(self, seconds: float, max_points: int = 600, spectra: bool = False) -> Dict[str, Any]:
+        """Precomputed points covering the last N seconds"""
+        tier = self.tier_for(seconds, max_points)
+        if tier is None:
+            return {'resolution_sec': None, 'times': [], 'counts': [], 'max_energy': [], 'threat_levels': []}
+        
+        series = tier.series(time.time() - seconds, spectra)
+        series['resolution_sec'] = tier.resolution_sec
+        return series
+    
+    def snapshot(self) -> List[Dict[str, Any]]:
+        """Independent copies of every tier's series, finest first"""
+        return [dict(tier.series(), resolution_sec=tier.resolution_sec) for tier in self.tiers]
+    
+    @staticmethod
+    def select(snapshot: List[Dict[str, Any]], seconds: float, max_points: int = 600) -> Dict[str, Any]:
+        """series() answered from a snapshot() taken earlier"""
+        chosen = next((s for s in snapshot if seconds / s['resolution_sec'] <= max_points),
+                      snapshot[-1] if snapshot else None)
+        if chosen is None:
+            return {'resolution_sec': None, 'times': [], 'counts': [], 'max_energy': [], 'threat_levels': []}
+        
+        first = int(np.searchsorted(chosen['times'], time.time() - seconds, side='left'))
+        series = {key: chosen[key][first:] for key in ('times', 'counts', 'max_energy', 'threat_levels')}
+        series['resolution_sec'] = chosen['resolution_sec']
+        return series
+
+class UpdateBroadcaster:
+    """Fan-out of per-tick updates to any number of readers
+
+    Each update is serialized to JSON once, by the publisher, into a ring of
+    recent messages numbered by a sequence counter. Readers keep their own
+    cursor and block on a shared condition until newer messages exist, so the
+    cost of a tick does not grow with the number of readers.
+    """
+    
+    def __init__(self, size: int = 256):
+        self.size = size
+        self.sequence = 0
+        self._messages = [None] * size
+        self._condition = threading.Condition()
+    
+    def publish(self, update: Dict[str, Any]) -> int:
+        """Serialize an update, store it and wake all waiting readers"""
+        message = json.dumps(update, separators=(',', ':'))
+        with self._condition:
+            self.sequence += 1
+            self._messages[self.sequence % self.size] = message
+            self._condition.notify_all()
+        return self.sequence
+    
+    def wait(self, after: int, timeout: float = None) -> List[Tuple[int, str]]:
+        """
+        Messages published after sequence number `after`, blocking until one exists
+        Returns: (sequence, JSON message) pairs oldest first, empty on timeout,
+        or None if the reader lost messages to the ring and must resync
+        """
+        with self._condition:
+            self._condition.wait_for(lambda: self.sequence != after, timeout)
+            if after > self.sequence or self.sequence - after > self.size:
+                return None
+            return [(sequence, self._messages[sequence % self.size])
+                    for sequence in range(after + 1, self.sequence + 1)]
+
 def format_frequency(freq_hz: float) -> str:
     """Format frequency for display"""
     if freq_hz >= 1000:
@@ -4,12 +4,19 @@
  * 
  * This module captures real-time audio from the system microphone using ALSA
  * and streams the data to the Python analysis layer via UNIX socket.
+ * With --shm, PCM is written into a memory-mapped ring buffer instead and the
+ * socket only carries wakeup notifications.
  */
 
+#define _POSIX_C_SOURCE 200809L
+
 #include <stdio.h>
 #include <stdlib.h>
 #include <string.h>
+#include <stdint.h>
 #include <unistd.h>
+#include <fcntl.h>
+#include <sys/mman.h>
 #include <sys/socket.h>
 #include <sys/un.h>
 #include <errno.h>
@@ -22,7 +29,20 @@
 #define CHANNELS 1
 #define FRAMES_PER_BUFFER 2048
 #define SOCKET_PATH "/tmp/silenttrace.sock"
-#define BUFFER_DURATION_SEC 1
+
+// Streaming hop: new frames emitted per message. The default mirrors
+// AudioConfig in config.py (fft_window_size * (1 - overlap_ratio)) so each
+// message advances the analyzer's FFT window by exactly one STFT hop; set
+// --hop to match when those are changed.
+#define FFT_WINDOW_SIZE 4096
+#define OVERLAP_RATIO 0.5
+#define DEFAULT_HOP_FRAMES ((size_t)(FFT_WINDOW_SIZE * (1.0 - OVERLAP_RATIO)))
+
+// Shared-memory ring transport
+#define SHM_RING_PATH "/dev/shm/silenttrace_ring"
+#define SHM_RING_MAGIC 0x42525453  // "STRB"
+#define SHM_RING_VERSION 1
+#define SHM_RING_DURATION_SEC 4
 
 // Message header structure for C->Python communication
 typedef struct {
@@ -32,11 +52,28 @@ typedef struct {
     uint32_t channels;
 } audio_header_t;
 
+// Shared-memory ring header, followed by capacity * CHANNELS int16 samples.
+// Cursors count frames written/consumed since start and never wrap.
+typedef struct {
+    uint32_t magic;
+    uint32_t version;
+    uint32_t sample_rate;
+    uint32_t channels;
+    uint64_t capacity;
+    uint64_t write_pos;  // Owned by the producer (this module)
+    uint64_t read_pos;   // Owned by the Python consumer
+    uint8_t reserved[24];
+} shm_ring_header_t;
+
 // Global variables for cleanup
 static snd_pcm_t *capture_handle = NULL;
 static int socket_fd = -1;
 static int client_fd = -1;
 static volatile int running = 1;
+static int use_shm = 0;
+static size_t hop_frames = DEFAULT_HOP_FRAMES;
+static shm_ring_header_t *shm_ring = NULL;
+static size_t shm_ring_size = 0;
 
 void cleanup_and_exit(int sig) {
     fprintf(stderr, "[INFO] Cleaning up resources...\n");
@@ -57,6 +94,12 @@ void cleanup_and_exit(int sig) {
         socket_fd = -1;
     }
     
+    if (shm_ring) {
+        munmap(shm_ring, shm_ring_size);
+        shm_ring = NULL;
+        unlink(SHM_RING_PATH);
+    }
+    
     unlink(SOCKET_PATH);
     fprintf(stderr, "[INFO] Cleanup complete. Exiting.\n");
     exit(0);
@@ -175,6 +218,62 @@ int setup_unix_socket() {
     return 0;
 }
 
+int setup_shm_ring() {
+    uint64_t capacity = (uint64_t)SAMPLE_RATE * SHM_RING_DURATION_SEC;
+    int fd;
+    
+    shm_ring_size = sizeof(shm_ring_header_t) + capacity * CHANNELS * sizeof(int16_t);
+    
+    fd = open(SHM_RING_PATH, O_RDWR | O_CREAT | O_TRUNC, 0600);
+    if (fd == -1) {
+        fprintf(stderr, "[ERROR] Cannot create shared-memory ring: %s\n", strerror(errno));
+        return -1;
+    }
+    
+    if (ftruncate(fd, shm_ring_size) == -1) {
+        fprintf(stderr, "[ERROR] Cannot size shared-memory ring: %s\n", strerror(errno));
+        close(fd);
+        return -1;
+    }
+    
+    shm_ring = mmap(NULL, shm_ring_size, PROT_READ | PROT_WRITE, MAP_SHARED, fd, 0);
+    close(fd);
+    if (shm_ring == MAP_FAILED) {
+        fprintf(stderr, "[ERROR] Cannot map shared-memory ring: %s\n", strerror(errno));
+        shm_ring = NULL;
+        return -1;
+    }
+    
+    memset(shm_ring, 0, sizeof(shm_ring_header_t));
+    shm_ring->version = SHM_RING_VERSION;
+    shm_ring->sample_rate = SAMPLE_RATE;
+    shm_ring->channels = CHANNELS;
+    shm_ring->capacity = capacity;
+    // Publish the magic last so readers never see a half-initialized header
+    __atomic_store_n(&shm_ring->magic, SHM_RING_MAGIC, __ATOMIC_RELEASE);
+    
+    fprintf(stderr, "[INFO] Shared-memory ring created at %s (%d seconds)\n",
+            SHM_RING_PATH, SHM_RING_DURATION_SEC);
+    return 0;
+}
+
+void shm_ring_write(const int16_t *buffer, size_t frames) {
+    int16_t *samples = (int16_t *)(shm_ring + 1);
+    uint64_t write_pos = __atomic_load_n(&shm_ring->write_pos, __ATOMIC_RELAXED);
+    size_t start = write_pos % shm_ring->capacity;
+    size_t first = frames;
+    
+    if (start + first > shm_ring->capacity) {
+        first = shm_ring->capacity - start;
+    }
+    
+    memcpy(samples + start * CHANNELS, buffer, first * CHANNELS * sizeof(int16_t));
+    memcpy(samples, buffer + first * CHANNELS, (frames - first) * CHANNELS * sizeof(int16_t));
+    
+    // Make the samples visible before the cursor that covers them
+    __atomic_store_n(&shm_ring->write_pos, write_pos + frames, __ATOMIC_RELEASE);
+}
+
 int wait_for_client() {
     fprintf(stderr, "[INFO] Waiting for Python client connection...\n");
     
@@ -194,6 +293,22 @@ uint64_t get_timestamp_ms() {
     return (uint64_t)(ts.tv_sec * 1000 + ts.tv_nsec / 1000000);
 }
 
+int send_notification(size_t frames) {
+    audio_header_t header;
+    
+    header.timestamp = get_timestamp_ms();
+    header.sample_rate = SAMPLE_RATE;
+    header.buffer_length = frames;
+    header.channels = CHANNELS;
+    
+    if (send(client_fd, &header, sizeof(header), 0) != sizeof(header)) {
+        fprintf(stderr, "[ERROR] Failed to send notification: %s\n", strerror(errno));
+        return -1;
+    }
+    
+    return 0;
+}
+
 int send_audio_data(int16_t *buffer, size_t frames) {
     audio_header_t header;
     size_t data_size = frames * sizeof(int16_t) * CHANNELS;
@@ -219,26 +334,50 @@ int send_audio_data(int16_t *buffer, size_t frames) {
     return 0;
 }
 
+int stream_frames(int16_t *hop_buffer, size_t *hop_fill, const int16_t *buffer, size_t frames) {
+    size_t offset = 0;
+    
+    // Bulk-copy into the hop buffer and emit every completed hop in capture order
+    while (offset < frames) {
+        size_t count = hop_frames - *hop_fill;
+        if (count > frames - offset) {
+            count = frames - offset;
+        }
+        
+        memcpy(hop_buffer + *hop_fill * CHANNELS, buffer + offset * CHANNELS,
+               count * CHANNELS * sizeof(int16_t));
+        *hop_fill += count;
+        offset += count;
+        
+        if (*hop_fill == hop_frames) {
+            if (send_audio_data(hop_buffer, hop_frames) < 0) {
+                return -1;
+            }
+            *hop_fill = 0;
+        }
+    }
+    
+    return 0;
+}
+
 void audio_capture_loop() {
     int16_t *buffer;
-    int16_t *rolling_buffer;
-    size_t rolling_buffer_size = SAMPLE_RATE * BUFFER_DURATION_SEC; // 1 second of audio
-    size_t rolling_buffer_pos = 0;
+    int16_t *hop_buffer;
+    size_t hop_fill = 0;
     int frames_read;
-    int chunks_processed = 0;
     
     // Allocate buffers
     buffer = malloc(FRAMES_PER_BUFFER * sizeof(int16_t) * CHANNELS);
-    rolling_buffer = malloc(rolling_buffer_size * sizeof(int16_t) * CHANNELS);
+    hop_buffer = malloc(hop_frames * sizeof(int16_t) * CHANNELS);
     
-    if (!buffer || !rolling_buffer) {
+    if (!buffer || !hop_buffer) {
         fprintf(stderr, "[ERROR] Cannot allocate audio buffers\n");
+        free(buffer);
+        free(hop_buffer);
         return;
     }
     
-    memset(rolling_buffer, 0, rolling_buffer_size * sizeof(int16_t) * CHANNELS);
-    
-    fprintf(stderr, "[INFO] Starting audio capture loop...\n");
+    fprintf(stderr, "[INFO] Starting audio capture loop (%zu-frame hops)...\n", hop_frames);
     
     while (running) {
         // Read audio frames
@@ -253,31 +392,49 @@ void audio_capture_loop() {
             break;
         }
         
-        // Copy to rolling buffer
-        for (int i = 0; i < frames_read * CHANNELS; i++) {
-            rolling_buffer[rolling_buffer_pos] = buffer[i];
-            rolling_buffer_pos = (rolling_buffer_pos + 1) % rolling_buffer_size;
+        if (use_shm) {
+            shm_ring_write(buffer, frames_read);
+            hop_fill += frames_read;
+            
+            // Wake the Python client once per completed hop
+            if (hop_fill >= hop_frames) {
+                if (send_notification(hop_fill) < 0) {
+                    fprintf(stderr, "[ERROR] Failed to notify Python client\n");
+                    break;
+                }
+                hop_fill = 0;
+            }
+            continue;
         }
         
-        chunks_processed++;
-        
-        // Send data every ~1 second (approximate based on buffer size)
-        if (chunks_processed >= (SAMPLE_RATE / FRAMES_PER_BUFFER)) {
-            if (send_audio_data(rolling_buffer, rolling_buffer_size / CHANNELS) < 0) {
-                fprintf(stderr, "[ERROR] Failed to send audio data to Python client\n");
-                break;
-            }
-            
-            chunks_processed = 0;
-            fprintf(stderr, "[DEBUG] Sent 1-second audio chunk to Python\n");
+        if (stream_frames(hop_buffer, &hop_fill, buffer, frames_read) < 0) {
+            fprintf(stderr, "[ERROR] Failed to send audio data to Python client\n");
+            break;
         }
     }
     
     free(buffer);
-    free(rolling_buffer);
+    free(hop_buffer);
 }
 
-int main() {
+int main(int argc, char **argv) {
+    for (int i = 1; i < argc; i++) {
+        if (strcmp(argv[i], "--shm") == 0) {
+            use_shm = 1;
+        } else if (strcmp(argv[i], "--hop") == 0 && i + 1 < argc) {
+            char *end;
+            long frames = strtol(argv[++i], &end, 10);
+            if (*end != '\0' || frames <= 0) {
+                fprintf(stderr, "[ERROR] Invalid hop size: %s\n", argv[i]);
+                return 1;
+            }
+            hop_frames = (size_t)frames;
+        } else {
+            fprintf(stderr, "Usage: %s [--shm] [--hop FRAMES]\n", argv[0]);
+            return 1;
+        }
+    }
+    
     // Setup signal handlers
     signal(SIGINT, cleanup_and_exit);
     signal(SIGTERM, cleanup_and_exit);
@@ -290,6 +447,12 @@ int main() {
         cleanup_and_exit(1);
     }
     
+    // Setup shared-memory ring before the socket so it exists once clients connect
+    if (use_shm && setup_shm_ring() < 0) {
+        fprintf(stderr, "[ERROR] Failed to setup shared-memory ring\n");
+        cleanup_and_exit(1);
+    }
+    
     // Setup Unix socket
     if (setup_unix_socket() < 0) {
         fprintf(stderr, "[ERROR] Failed to setup Unix socket\n");